@@ -0,0 +1,249 @@
+"""Fair-share executor for background document analyses.
+
+Analyses used to run as request background tasks in upload order, so a user
+bulk-uploading a data room held everyone else's uploads up until their batch
+was done. Jobs now wait in per-owner queues and a small worker pool picks
+them:
+
+- An upload from an owner with nothing queued or running goes to the
+  interactive lane, which is always served first. Uploads the owner makes
+  while earlier ones are still pending go to the bulk lane.
+- The bulk lane is served by deficit round robin over owners. A job costs its
+  estimated prompt tokens, so every owner with queued work gets the same
+  share of analysis throughput, however many or large their documents are.
+- No owner runs more than PER_USER_CONCURRENCY analyses at once, and bulk
+  jobs never take the last RESERVED_INTERACTIVE workers.
+
+The queue lives in process memory, like the Q&A cache. Fairness is therefore
+per API process. Queued jobs do not survive a restart; analysis_recovery.py
+queues documents that were never analyzed again at startup.
+"""
+import copy
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+WORKERS = int(os.getenv("LEXILENS_ANALYSIS_WORKERS", "4"))
+PER_USER_CONCURRENCY = int(os.getenv("LEXILENS_ANALYSIS_PER_USER", "2"))
+RESERVED_INTERACTIVE = int(os.getenv("LEXILENS_ANALYSIS_RESERVED_INTERACTIVE", "1"))
+# Tokens of analysis an owner earns per round-robin turn
+QUANTUM_TOKENS = int(os.getenv("LEXILENS_ANALYSIS_QUANTUM_TOKENS", "10000"))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class Job(NamedTuple):
+    document_id: int
+    owner_id: int
+    cost: int  # estimated prompt tokens
+    lane: str
+    queued_at: float
+
+
+class _Schedule:
+    """Queued jobs and round-robin state; `pick` is the whole dispatch policy."""
+
+    def __init__(self):
+        self.interactive: Deque[Job] = deque()
+        self.bulk: Dict[int, Deque[Job]] = {}
+        self.ring: Deque[int] = deque()  # owners with queued bulk jobs, next to be served first
+        self.deficit: Dict[int, int] = {}
+
+    def jobs(self) -> List[Job]:
+        return list(self.interactive) + [job for queue in self.bulk.values() for job in queue]
+
+    def push(self, job: Job):
+        if job.lane == INTERACTIVE:
+            self.interactive.append(job)
+            return
+        if job.owner_id not in self.bulk:
+            self.bulk[job.owner_id] = deque()
+            self.deficit[job.owner_id] = 0
+            self.ring.append(job.owner_id)
+        self.bulk[job.owner_id].append(job)
+
+    def remove(self, document_id: int) -> Optional[Job]:
+        for job in self.jobs():
+            if job.document_id != document_id:
+                continue
+            if job.lane == INTERACTIVE:
+                self.interactive.remove(job)
+            else:
+                self.bulk[job.owner_id].remove(job)
+                if not self.bulk[job.owner_id]:
+                    self._retire(job.owner_id)
+            return job
+        return None
+
+    def _retire(self, owner_id: int):
+        del self.bulk[owner_id]
+        del self.deficit[owner_id]
+        self.ring.remove(owner_id)
+
+    def pick(self, can_run: Callable[[Job], bool]) -> Optional[Job]:
+        """Removes and returns the next job to start, or None if nothing queued may run now."""
+        for job in self.interactive:
+            if can_run(job):
+                self.interactive.remove(job)
+                return job
+
+        blocked = 0  # consecutive owners skipped because their next job may not run yet
+        while self.ring and blocked < len(self.ring):
+            owner_id = self.ring[0]
+            queue = self.bulk[owner_id]
+            if not can_run(queue[0]):
+                self.ring.rotate(-1)
+                blocked += 1
+                continue
+            blocked = 0
+            if self.deficit[owner_id] >= queue[0].cost:
+                job = queue.popleft()
+                self.deficit[owner_id] -= job.cost
+                if not queue:
+                    self._retire(owner_id)  # an idle owner does not bank credit
+                return job
+            self.deficit[owner_id] += QUANTUM_TOKENS
+            self.ring.rotate(-1)
+        return None
+
+    def order(self) -> List[Job]:
+        """Queued jobs in the order they would start if workers and caps were no constraint."""
+        schedule = copy.deepcopy(self)
+        ordered = []
+        job = schedule.pick(lambda job: True)
+        while job is not None:
+            ordered.append(job)
+            job = schedule.pick(lambda job: True)
+        return ordered
+
+
+class AnalysisQueue:
+    """Worker threads that run `run(document_id)` for submitted documents in fair-share order."""
+
+    def __init__(self, run: Callable[[int], None], workers: int = WORKERS):
+        self._run = run
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._schedule = _Schedule()
+        self._running: Dict[int, Job] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self.completed = 0
+
+    def start(self):
+        with self._cond:
+            self._stopping = False
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"lexilens-analysis-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self):
+        """Lets running analyses finish; queued ones are dropped with the process."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def _owner_load(self, owner_id: int) -> int:
+        return sum(1 for job in self._running.values() if job.owner_id == owner_id)
+
+    def _can_run(self, job: Job) -> bool:
+        if self._owner_load(job.owner_id) >= PER_USER_CONCURRENCY:
+            return False
+        if job.lane == BULK:
+            bulk_running = sum(1 for running in self._running.values() if running.lane == BULK)
+            return bulk_running < max(1, self.workers - RESERVED_INTERACTIVE)
+        return True
+
+    def submit(self, document_id: int, owner_id: int, cost: int) -> Job:
+        with self._cond:
+            existing = self._running.get(document_id) or next(
+                (job for job in self._schedule.jobs() if job.document_id == document_id), None
+            )
+            if existing:
+                return existing
+            idle = self._owner_load(owner_id) == 0 and not any(job.owner_id == owner_id for job in self._schedule.jobs())
+            job = Job(document_id, owner_id, max(1, cost), INTERACTIVE if idle else BULK, time.time())
+            self._schedule.push(job)
+            self._cond.notify()
+        if not self._threads:
+            self.start()
+        return job
+
+    def cancel(self, document_id: int) -> bool:
+        """Drops a queued job; an analysis that already started runs to the end."""
+        with self._cond:
+            return self._schedule.remove(document_id) is not None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._schedule.pick(self._can_run)
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._running[job.document_id] = job
+            try:
+                self._run(job.document_id)
+            except Exception as e:
+                print(f"❌ Queued analysis of document ID {job.document_id} failed: {e}")
+            finally:
+                with self._cond:
+                    del self._running[job.document_id]
+                    self.completed += 1
+                    # Finishing frees an owner slot as well as a worker, so any waiting worker may now have a job
+                    self._cond.notify_all()
+
+    def positions(self, owner_id: int) -> List[dict]:
+        """The owner's running and queued analyses; position 1 is the next job to start across all users."""
+        with self._cond:
+            running = [job for job in self._running.values() if job.owner_id == owner_id]
+            order = self._schedule.order()
+        items = [_describe(job, "running", None) for job in running]
+        items.extend(_describe(job, "queued", index + 1) for index, job in enumerate(order) if job.owner_id == owner_id)
+        return items
+
+    def position(self, owner_id: int, document_id: int) -> Optional[dict]:
+        return next((item for item in self.positions(owner_id) if item["document_id"] == document_id), None)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = self._schedule.jobs()
+            owners = {job.owner_id for job in queued} | {job.owner_id for job in self._running.values()}
+            return {
+                "workers": self.workers,
+                "per_user_concurrency": PER_USER_CONCURRENCY,
+                "quantum_tokens": QUANTUM_TOKENS,
+                "running": len(self._running),
+                "queued": {lane: sum(1 for job in queued if job.lane == lane) for lane in (INTERACTIVE, BULK)},
+                "completed": self.completed,
+                "owners": [
+                    {
+                        "owner_id": owner_id,
+                        "running": self._owner_load(owner_id),
+                        "queued": sum(1 for job in queued if job.owner_id == owner_id),
+                        "deficit_tokens": self._schedule.deficit.get(owner_id, 0),
+                    }
+                    for owner_id in sorted(owners)
+                ],
+            }
+
+
+def _describe(job: Job, state: str, position: Optional[int]) -> dict:
+    return {
+        "document_id": job.document_id,
+        "state": state,
+        "lane": job.lane,
+        "position": position,
+        "estimated_tokens": job.cost,
+        "queued_at": datetime.utcfromtimestamp(job.queued_at),
+    }
@@ -0,0 +1,175 @@
+"""Recovery of background analyses that a crash, restart or deploy cut short.
+
+The analysis queue lives in process memory, so a restart drops every job that
+had not started. At startup each process therefore queues the documents that
+have no finished or running analysis (`unanalyzed_documents`). Several
+processes may queue the same document; `duplicate_job` lets the first one to
+start it win.
+
+While an analysis runs, its "running" Analysis row is touched every
+HEARTBEAT_SECONDS, also during long model calls that persist nothing. A
+running row nobody has touched for STALE_SECONDS belongs to a process that is
+gone. Every API process sweeps for such rows at startup and then periodically;
+each row is claimed with a conditional UPDATE, so exactly one process marks it
+failed and queues its document again.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, engine
+from .models import (
+    ANALYSIS_COMPLETE, ANALYSIS_FAILED, ANALYSIS_PARTIAL, ANALYSIS_RUNNING, Analysis, Document
+)
+
+HEARTBEAT_SECONDS = float(os.getenv("LEXILENS_ANALYSIS_HEARTBEAT_SECONDS", "30"))
+STALE_SECONDS = float(os.getenv("LEXILENS_ANALYSIS_STALE_SECONDS", "300"))
+
+
+class PendingDocument(NamedTuple):
+    document_id: int
+    owner_id: int
+    tokens: int  # estimated prompt tokens, see text_cleaning.estimate_tokens
+
+
+def _last_touched():
+    return func.coalesce(Analysis.updated_at, Analysis.created_at)
+
+
+def _stale_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+
+
+def _text_tokens():
+    return func.length(func.coalesce(Document.clean_content, Document.content)) / 4
+
+
+@contextmanager
+def heartbeat(analysis_id: int):
+    """Keeps a running analysis' row fresh from a side thread until the block exits."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(Analysis)
+                        .where(Analysis.id == analysis_id, Analysis.status == ANALYSIS_RUNNING)
+                        .values(updated_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                print(f"⚠️ Heartbeat for analysis ID {analysis_id} failed: {e}")
+
+    thread = threading.Thread(target=beat, name=f"lexilens-heartbeat-{analysis_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def claim_interrupted(db: Session) -> List[PendingDocument]:
+    """Marks abandoned running analyses failed; returns the documents this process claimed."""
+    cutoff = _stale_cutoff()
+    rows = (
+        db.query(Analysis.id, Document.id, Document.owner_id, _text_tokens())
+        .join(Document, Document.id == Analysis.document_id)
+        .filter(Analysis.status == ANALYSIS_RUNNING, _last_touched() < cutoff)
+        .all()
+    )
+    claimed = []
+    for analysis_id, document_id, owner_id, tokens in rows:
+        result = db.execute(
+            update(Analysis)
+            .where(Analysis.id == analysis_id, Analysis.status == ANALYSIS_RUNNING, _last_touched() < cutoff)
+            .values(status=ANALYSIS_FAILED)
+        )
+        db.commit()
+        if result.rowcount == 1:  # another process may have claimed it first
+            claimed.append(PendingDocument(document_id, owner_id, max(1, int(tokens or 0))))
+    return claimed
+
+
+def unanalyzed_documents(db: Session) -> List[PendingDocument]:
+    """Documents with no complete, partial or running analysis (never started, or only failed), oldest first."""
+    handled = db.query(Analysis.document_id).filter(or_(
+        Analysis.status.in_([ANALYSIS_COMPLETE, ANALYSIS_PARTIAL, ANALYSIS_RUNNING]), Analysis.status.is_(None)
+    ))
+    rows = (
+        db.query(Document.id, Document.owner_id, _text_tokens())
+        .filter(Document.id.notin_(handled))
+        .order_by(Document.id)
+        .all()
+    )
+    return [PendingDocument(doc_id, owner_id, max(1, int(tokens or 0))) for doc_id, owner_id, tokens in rows]
+
+
+def duplicate_job(db: Session, document_id: int, prompt_version: str, model_name: str) -> bool:
+    """Whether another process is analyzing the document now or already produced a current, complete analysis.
+
+    Locks the document row first (PostgreSQL), so two processes starting the same document
+    one after the other see each other's "running" row; commit the new row to release it.
+    """
+    db.query(Document.id).filter(Document.id == document_id).with_for_update().first()
+    running = db.query(Analysis.id).filter(
+        Analysis.document_id == document_id,
+        Analysis.status == ANALYSIS_RUNNING,
+        _last_touched() >= _stale_cutoff(),
+    ).first()
+    current = db.query(Analysis.id).filter(
+        Analysis.document_id == document_id,
+        Analysis.status == ANALYSIS_COMPLETE,
+        Analysis.prompt_version == prompt_version,
+        Analysis.model_name == model_name,
+    ).first()
+    return running is not None or current is not None
+
+
+class RecoverySweeper:
+    """Daemon thread that re-queues interrupted analyses through `submit`, at startup and every STALE_SECONDS."""
+
+    def __init__(self, submit: Callable[[PendingDocument], None], interval: float = STALE_SECONDS):
+        self._submit = submit
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recovered = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lexilens-analysis-recovery", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def sweep(self) -> int:
+        db = SessionLocal()
+        try:
+            claimed = claim_interrupted(db)
+        except Exception as e:
+            print(f"❌ Could not check for interrupted analyses: {e}")
+            return 0
+        finally:
+            db.close()
+        for pending in claimed:
+            self._submit(pending)
+        if claimed:
+            self.recovered += len(claimed)
+            print(f"🩹 Re-queued {len(claimed)} analyses interrupted by a restart or crash: "
+                  f"{[pending.document_id for pending in claimed]}")
+        return len(claimed)
+
+    def _run(self):
+        while True:
+            self.sweep()
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,254 @@
+"""Versioned prompt templates and the chain registry built from them.
+
+Every chain is compiled once per model tier (see model_router.py) and reused
+for all requests; each call is routed to a tier by task and input size. Bump
+a template's version whenever its wording changes so cached answers and
+stored analyses can tell which prompt produced them. Prompts that return JSON
+carry a response schema; models that support it (Gemini) are constrained to
+emit exactly that shape. Each tier's model reports every call to usage.py.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+from uuid import UUID
+
+from langchain.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import LLMResult
+
+from . import usage
+from .model_router import ModelRouter, RoutedChain
+
+
+class PromptSpec(NamedTuple):
+    version: str
+    template: str
+    schema: Optional[Dict[str, Any]] = None
+
+
+def _string_list() -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}}
+
+
+RISK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_risk_score": {"type": "number"},
+        "clauses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "clause_id": {"type": "string"},
+                    "clause": {"type": "string"},
+                    "risk": {"type": "string", "enum": ["High", "Medium", "Low"]},
+                    "confidence": {"type": "number"},
+                    "reason": {"type": "string"},
+                },
+                "required": ["clause_id", "clause", "risk", "confidence", "reason"],
+            },
+        },
+    },
+    "required": ["overall_risk_score", "clauses"],
+}
+
+NEGOTIATE_SCHEMA = {
+    "type": "object",
+    "properties": {"suggestions": _string_list()},
+    "required": ["suggestions"],
+}
+
+NEGOTIATE_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "negotiations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"clause_number": {"type": "integer"}, "suggestions": _string_list()},
+                "required": ["clause_number", "suggestions"],
+            },
+        },
+    },
+    "required": ["negotiations"],
+}
+
+SUGGESTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {"qa_suggestions": _string_list(), "scenario_suggestions": _string_list()},
+    "required": ["qa_suggestions", "scenario_suggestions"],
+}
+
+
+PROMPTS: Dict[str, PromptSpec] = {
+    "risk": PromptSpec(
+        "3",
+        """Analyze the following clauses from a legal document for risk. They were pre-selected as relating to Termination, Payment terms, Liability, Intellectual property, Confidentiality, or Dispute resolution; each line starts with the clause ID in square brackets and its candidate categories in parentheses. Go through the clauses in the order given. For each clause that carries risk, provide: 'clause_id' (the ID without brackets), 'clause' (quoted text), 'risk' (High, Medium, or Low), 'confidence' (0-1 score), and 'reason'. Also, calculate an 'overall_risk_score' (0-1) for the document. Clauses:\n{clauses}\nOutput ONLY a valid JSON object with keys: 'overall_risk_score', 'clauses' (a list of dictionaries in the same order as the clauses above).""",
+        RISK_SCHEMA
+    ),
+    "simplify": PromptSpec(
+        "1",
+        """Simplify the following legal document into plain English. Focus on key obligations, rights, and risks. Document text: {text}. Provide a concise simplified summary."""
+    ),
+    "scenario": PromptSpec(
+        "1",
+        """Analyze this legal scenario: "{scenario}"\n\nBased ONLY on the following document content, provide actionable advice and potential risks.\n\nDocument Content:\n"{content}"\n\nYour structured response should include:\n- A summary of the scenario.\n- Potential risks based on the document.\n- Recommended actions."""
+    ),
+    "qa": PromptSpec(
+        "1",
+        """
+        You are an AI assistant specialized in legal document analysis.
+        Answer the following question based ONLY on the provided document content.
+        If the answer is not in the document, state that clearly. Be concise and precise.
+
+        Question: "{question}"
+
+        Document Content:
+        "{content}"
+        """
+    ),
+    "negotiate": PromptSpec(
+        "1",
+        """
+        You are an AI assistant skilled in legal contract negotiation.
+        Your user has identified a clause with a '{risk_level}' risk level.
+        Your task is to rewrite this clause to be more fair and balanced, while preserving the original intent where possible.
+
+        Original Clause:
+        "{clause_text}"
+
+        Generate 2-3 distinct, alternative versions of this clause that are more favorable to the user.
+        Each suggestion should be a complete, professionally worded clause.
+
+        Return ONLY a JSON object with a single key "suggestions" which is a list of the suggested clause strings.
+        Example: {{"suggestions": ["First suggested clause...", "Second suggested clause..."]}}
+        """,
+        NEGOTIATE_SCHEMA
+    ),
+    "negotiate_batch": PromptSpec(
+        "2",
+        """
+        You are an AI assistant skilled in legal contract negotiation.
+        Your user has identified the clauses below as risky. Each line starts with the clause number in square brackets and its risk level in parentheses.
+        For every clause, rewrite it to be more fair and balanced, while preserving the original intent where possible.
+
+        Clauses:
+        {clauses}
+
+        Generate 2-3 distinct, alternative versions of each clause that are more favorable to the user.
+        Each suggestion should be a complete, professionally worded clause.
+
+        Return ONLY a JSON object with a single key "negotiations": a list with one entry per clause, giving its "clause_number" and its list of suggested clause strings.
+        Example: {{"negotiations": [{{"clause_number": 0, "suggestions": ["First suggested clause...", "Second suggested clause..."]}}, {{"clause_number": 3, "suggestions": ["..."]}}]}}
+        """,
+        NEGOTIATE_BATCH_SCHEMA
+    ),
+    "suggestions": PromptSpec(
+        "1",
+        """
+        You are an AI assistant analyzing a legal document. Your task is to generate insightful questions a user might have.
+        Based on the following document content, generate two lists of questions:
+        1.  `qa_suggestions`: Three questions that can be answered directly from the text (e.g., "What is the termination notice period?").
+        2.  `scenario_suggestions`: Three hypothetical "what-if" questions (e.g., "What happens if a payment is missed?").
+
+        Document Content (first 2000 characters):
+        "{content}"
+
+        Return ONLY a valid JSON object with two keys: "qa_suggestions" and "scenario_suggestions".
+        Example: {{"qa_suggestions": ["...", "..."], "scenario_suggestions": ["...", "..."]}}
+        """,
+        SUGGESTIONS_SCHEMA
+    ),
+}
+
+# Chains whose output is persisted as an Analysis row
+ANALYSIS_CHAINS = ("risk", "simplify")
+
+
+def prompt_version(*names: str) -> str:
+    """Compact version tag for one or more prompts, e.g. 'risk:1,simplify:1'."""
+    return ",".join(f"{name}:{PROMPTS[name].version}" for name in names)
+
+
+def with_schema(llm, schema: Optional[Dict[str, Any]]):
+    """Binds JSON mode and a response schema for models that support it; others rely on the prompt."""
+    if schema is None or not hasattr(llm, "response_schema"):
+        return llm
+    return llm.bind(response_mime_type="application/json", response_schema=schema)
+
+
+class CallRecorder(BaseCallbackHandler):
+    """Records tokens, latency and outcome of every call one prompt makes on one tier."""
+
+    # Run in the caller's context (not an executor) so usage.attribute() scopes apply
+    run_inline = True
+    MAX_OPEN_CALLS = 1000
+    OPEN_CALL_SECONDS = 3600
+
+    def __init__(self, chain: str, tier: str, model: str):
+        self.chain = chain
+        self.tier = tier
+        self.model = model
+        self._lock = threading.Lock()
+        self._started: Dict[UUID, tuple] = {}
+
+    def _start(self, run_id: UUID):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._started) >= self.MAX_OPEN_CALLS:
+                # A cancelled ainvoke never reports an end or error, so its entry would stay forever
+                self._started = {key: value for key, value in self._started.items() if now - value[0] < self.OPEN_CALL_SECONDS}
+            self._started[run_id] = (now, usage.current_scope())
+
+    def _finish(self, run_id: UUID) -> tuple:
+        with self._lock:
+            return self._started.pop(run_id, (time.monotonic(), None))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        started, scope = self._finish(run_id)
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        tokens = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+        usage.record_call(self.chain, self.model, self.tier, tokens.get("input_tokens", 0), tokens.get("output_tokens", 0),
+                          (time.monotonic() - started) * 1000, scope=scope)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        started, scope = self._finish(run_id)
+        status = "cancelled" if isinstance(error, asyncio.CancelledError) else "error"
+        usage.record_call(self.chain, self.model, self.tier, 0, 0, (time.monotonic() - started) * 1000, status, scope)
+
+
+class ChainRegistry:
+    """Compiles `prompt | llm | parser` for every prompt and tier once and hands out routed chains."""
+
+    def __init__(self, router: ModelRouter):
+        self.router = router
+        self.model_name = router.model_name
+        parser = StrOutputParser()
+        self._chains = {}
+        for name, spec in PROMPTS.items():
+            prompt = PromptTemplate.from_template(spec.template)
+            per_tier = {
+                tier: prompt
+                | with_schema(llm, spec.schema).with_config(callbacks=[CallRecorder(name, tier, router.models[tier])])
+                | parser
+                for tier, llm in router.llms.items()
+            }
+            self._chains[name] = RoutedChain(router, name, per_tier)
+
+    def get(self, name: str):
+        return self._chains[name]
+
+    def version(self, name: str) -> str:
+        return PROMPTS[name].version
+
+    @property
+    def analysis_version(self) -> str:
+        return prompt_version(*ANALYSIS_CHAINS)
@@ -0,0 +1,134 @@
+"""Local clause segmentation and category tagging.
+
+Splits a contract into numbered clauses with exact character offsets and tags
+each with the risk categories the risk prompt cares about, using keyword
+patterns. Only tagged clauses are sent to the LLM, which keeps the risk prompt
+small on long agreements and lets the UI point at the exact span of a flagged
+clause.
+"""
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+CATEGORY_PATTERNS: Dict[str, re.Pattern] = {
+    "Termination": re.compile(
+        r"\bterminat\w*|\bexpir\w*|\bnotice period\b|\brenew\w*|\bcancel\w*", re.IGNORECASE),
+    "Payment": re.compile(
+        r"\bpay(?:s|ment|ments|able|ing)?\b|\binvoic\w*|\bfees?\b|\bcompensation\b|\bremuneration\b|\binterest\b|\brefund\w*|\bprice\b", re.IGNORECASE),
+    "Liability": re.compile(
+        r"\bliab\w+|\bindemn\w+|\bdamages\b|\bhold harmless\b|\bwarrant\w*|\bconsequential\b", re.IGNORECASE),
+    "Intellectual Property": re.compile(
+        r"\bintellectual property\b|\bcopyright\w*|\bpatent\w*|\btrademark\w*|\binvention\w*|\bwork product\b|\blicen[cs]\w*|\btitle and interest\b", re.IGNORECASE),
+    "Confidentiality": re.compile(
+        r"\bconfidential\w*|\bnon-disclosure\b|\bdisclos\w+|\bproprietary\b|\btrade secrets?\b", re.IGNORECASE),
+    "Dispute Resolution": re.compile(
+        r"\barbitrat\w+|\bdisputes?\b|\bgoverning law\b|\bgoverned by\b|\bjurisdiction\b|\bcourts?\b|\bmediat\w+|\bvenue\b", re.IGNORECASE),
+}
+
+# "1.", "2.3", "4.1.2", "7)", "(a)", "Section 5", "Article IV", "Clause 9.1" at the start of a line
+CLAUSE_START = re.compile(
+    r"^[ \t]*(?P<number>(?:\d+\.)+\d*|\d+\)|\([a-z]{1,3}\)|(?:section|article|clause)\s+[\dIVXLC]+(?:\.\d+)*\.?)[ \t]+",
+    re.IGNORECASE | re.MULTILINE,
+)
+TOP_LEVEL_NUMBER = re.compile(r"\d+\.?|\d+\)|(?:section|article|clause)\s+[\dIVXLC]+\.?", re.IGNORECASE)
+MIN_NUMBERED_CLAUSES = 3
+HEADING_MAX_CHARS = 80
+FALLBACK_CHUNK_CHARS = 1200
+PROMPT_CLAUSE_CHARS = 1500
+
+
+class Clause(NamedTuple):
+    id: str
+    number: str
+    text: str
+    start: int
+    end: int
+    categories: Tuple[str, ...]
+    is_heading: bool = False
+
+
+def _is_heading(body: str) -> bool:
+    body = body.strip()
+    return bool(body) and len(body) <= HEADING_MAX_CHARS and "\n" not in body and body.upper() == body
+
+
+def _tag(text: str) -> Tuple[str, ...]:
+    return tuple(name for name, pattern in CATEGORY_PATTERNS.items() if pattern.search(text))
+
+
+def _spans_numbered(text: str) -> List[Tuple[str, int, int]]:
+    starts = list(CLAUSE_START.finditer(text))
+    if len(starts) < MIN_NUMBERED_CLAUSES:
+        return []
+    spans = []
+    if text[:starts[0].start()].strip():
+        spans.append(("", 0, starts[0].start()))
+    for match, following in zip(starts, starts[1:] + [None]):
+        end = following.start() if following else len(text)
+        spans.append((match.group("number"), match.start(), end))
+    return spans
+
+
+def _spans_paragraphs(text: str) -> List[Tuple[str, int, int]]:
+    """Fallback for unnumbered documents: blank-line paragraphs, long ones cut at sentence ends."""
+    spans = []
+    for para in re.finditer(r"\S(?:.|\n(?!\s*\n))*", text):
+        start, end = para.start(), para.end()
+        while end - start > FALLBACK_CHUNK_CHARS:
+            cut = text.rfind(". ", start, start + FALLBACK_CHUNK_CHARS)
+            cut = cut + 1 if cut > start else start + FALLBACK_CHUNK_CHARS
+            spans.append(("", start, cut))
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        spans.append(("", start, end))
+    return spans
+
+
+def segment_clauses(text: str) -> List[Clause]:
+    """Splits `text` into clauses; offsets index into `text` itself."""
+    clauses = []
+    heading_categories: Tuple[str, ...] = ()
+    for number, start, end in _spans_numbered(text) or _spans_paragraphs(text):
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        while start < end and text[start].isspace():
+            start += 1
+        if end <= start:
+            continue
+        body = text[start:end]
+        own = _tag(body)
+        heading = bool(number) and _is_heading(body[len(number):])
+        if heading:
+            # Section headings ("5. CONFIDENTIALITY") carry their category to the sub-clauses below
+            heading_categories = own
+        elif TOP_LEVEL_NUMBER.fullmatch(number):
+            heading_categories = ()
+        categories = own if heading else tuple(dict.fromkeys(own + heading_categories))
+        clauses.append(Clause(f"C{len(clauses) + 1}", number, body, start, end, categories, heading))
+    return clauses
+
+
+def candidate_clauses(clauses: List[Clause]) -> List[Clause]:
+    """Clauses worth sending to the risk prompt: tagged with at least one category, headings excluded."""
+    return [clause for clause in clauses if clause.categories and not clause.is_heading]
+
+
+def format_for_prompt(clauses: List[Clause]) -> str:
+    return "\n".join(
+        f"[{clause.id}] ({', '.join(clause.categories) or 'Uncategorized'}) {clause.text[:PROMPT_CLAUSE_CHARS]}"
+        for clause in clauses
+    )
+
+
+def attach_offsets(flagged: List[dict], clauses: List[Clause]) -> List[dict]:
+    """Adds exact start/end offsets and categories to LLM-flagged clauses that cite a known clause_id.
+
+    The offsets index into the text the clauses were segmented from (Document.prompt_text),
+    not the raw extraction.
+    """
+    by_id = {clause.id: clause for clause in clauses}
+    for item in flagged:
+        clause = by_id.get(str(item.get("clause_id", "")).strip("[] "))
+        if clause:
+            item.update(clause_id=clause.id, start=clause.start, end=clause.end, categories=list(clause.categories))
+    return flagged
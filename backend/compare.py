@@ -0,0 +1,233 @@
+"""Clause-level comparison of two stored documents.
+
+Clauses are aligned locally with difflib on whitespace- and number-normalized
+text, so a renumbered but otherwise identical clause still counts as
+unchanged. Risk results are reused from the stored analyses of either
+document. Only added or changed clauses that neither analysis assessed go to
+the LLM, so the cost of a comparison follows the size of the diff.
+
+inherit_analysis applies the same alignment to a freshly uploaded
+near-duplicate of an analyzed document (see near_duplicates.py). It builds
+the new document's analysis from the old one plus the differing clauses.
+"""
+import difflib
+import hashlib
+import json
+import re
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .clauses import CLAUSE_START, Clause, attach_offsets, candidate_clauses, segment_clauses
+from .models import ANALYSIS_PARTIAL, Analysis
+from .risk_analysis import stream_risk
+
+CHANGED_MIN_SIMILARITY = 0.5  # below this a replaced clause is reported as removed + added
+
+
+class Alignment(NamedTuple):
+    status: str  # "unchanged", "changed", "added" or "removed"
+    base: Optional[Clause]
+    other: Optional[Clause]
+    similarity: float
+
+
+def clause_key(text: str) -> str:
+    """Comparison key: clause text without its number, case and whitespace differences."""
+    number = CLAUSE_START.match(text)
+    return re.sub(r"\s+", " ", text[number.end():] if number else text).strip().lower()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(clause_key(text).encode("utf-8")).hexdigest()
+
+
+def _pair_replaced(base: List[Clause], other: List[Clause]) -> List[Alignment]:
+    """Greedily pairs the clauses of a replaced block by similarity; leftovers are removed/added."""
+    keys = {id(c): clause_key(c.text) for c in base + other}
+    unused = list(base)
+    aligned: List[Alignment] = []
+    for new in other:
+        best, best_ratio = None, CHANGED_MIN_SIMILARITY
+        for old in unused:
+            matcher = difflib.SequenceMatcher(None, keys[id(old)], keys[id(new)], autojunk=False)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = old, ratio
+        if best is None:
+            aligned.append(Alignment("added", None, new, 0.0))
+        else:
+            unused.remove(best)
+            aligned.append(Alignment("changed", best, new, round(best_ratio, 4)))
+    aligned.extend(Alignment("removed", old, None, 0.0) for old in unused)
+    return aligned
+
+
+def align_clauses(base: List[Clause], other: List[Clause]) -> List[Alignment]:
+    """Aligns the body clauses (headings skipped) of two documents in document order."""
+    base = [c for c in base if not c.is_heading]
+    other = [c for c in other if not c.is_heading]
+    matcher = difflib.SequenceMatcher(None, [_digest(c.text) for c in base], [_digest(c.text) for c in other], autojunk=False)
+    aligned: List[Alignment] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            aligned.extend(Alignment("unchanged", b, o, 1.0) for b, o in zip(base[i1:i2], other[j1:j2]))
+        elif tag == "delete":
+            aligned.extend(Alignment("removed", b, None, 0.0) for b in base[i1:i2])
+        elif tag == "insert":
+            aligned.extend(Alignment("added", None, o, 0.0) for o in other[j1:j2])
+        else:
+            aligned.extend(_pair_replaced(base[i1:i2], other[j1:j2]))
+    return aligned
+
+
+def _prompt_versions(analysis: Analysis) -> Dict[str, str]:
+    """{"risk": "2", ...} from a stored tag such as "risk:2,simplify:1"."""
+    return dict(part.split(":", 1) for part in (analysis.prompt_version or "").split(",") if ":" in part)
+
+
+def stored_assessment(analysis: Optional[Analysis], clauses: List[Clause],
+                      risk_version: Optional[str] = None) -> Tuple[Set[str], Dict[str, dict]]:
+    """(digests of clauses the analysis assessed, flagged results by digest) for one document.
+
+    An unflagged candidate clause only counts as "not risky" when the analysis covered every
+    candidate, so partial analyses and those from another risk prompt (when `risk_version`
+    is given) are ignored.
+    """
+    if analysis is None or analysis.status == ANALYSIS_PARTIAL:
+        return set(), {}
+    if risk_version is not None and _prompt_versions(analysis).get("risk") != risk_version:
+        return set(), {}
+    by_id = {clause.id: clause for clause in clauses}
+    flagged: Dict[str, dict] = {}
+    for item in json.loads(analysis.high_risk_clauses or "[]"):
+        clause = by_id.get(str(item.get("clause_id", "")))
+        flagged[_digest(clause.text if clause else item.get("clause", ""))] = item
+    assessed = {_digest(clause.text) for clause in candidate_clauses(clauses)} | set(flagged)
+    return assessed, flagged
+
+
+def _summary(clause: Optional[Clause], include_text: bool) -> Optional[dict]:
+    if clause is None:
+        return None
+    summary = {"clause_id": clause.id, "number": clause.number, "start": clause.start, "end": clause.end}
+    if include_text:
+        summary["text"] = clause.text
+    return summary
+
+
+def compare_documents(chains, base_text: str, base_analysis: Optional[Analysis], other_text: str,
+                      other_analysis: Optional[Analysis], include_unchanged: bool = False) -> dict:
+    base_clauses, other_clauses = segment_clauses(base_text), segment_clauses(other_text)
+    aligned = align_clauses(base_clauses, other_clauses)
+
+    risk_version = chains.version("risk") if chains is not None else None
+    base_assessed, base_flagged = stored_assessment(base_analysis, base_clauses, risk_version)
+    other_assessed, other_flagged = stored_assessment(other_analysis, other_clauses, risk_version)
+
+    # Clauses on the new side whose risk is already known from either analysis
+    known: Dict[str, Optional[dict]] = {}
+    for digest in base_assessed:
+        known[digest] = base_flagged.get(digest)
+    for digest in other_assessed:
+        known[digest] = other_flagged.get(digest)
+
+    to_assess = [
+        pair.other for pair in aligned
+        if pair.status in ("changed", "added") and _digest(pair.other.text) not in known
+        and pair.other.categories
+    ]
+    fresh: Dict[str, dict] = {}
+    # Digests the model assessed just now; unflagged ones only count when it covered them all
+    sent: Set[str] = set()
+    if to_assess:
+        if chains is None:
+            raise RuntimeError("AI service is unavailable.")
+        result = stream_risk(chains, to_assess, other_clauses)
+        by_id = {item.get("clause_id"): item for item in result.clauses}
+        fresh = {_digest(clause.text): by_id[clause.id] for clause in to_assess if clause.id in by_id}
+        sent = {_digest(clause.text) for clause in to_assess} if result.complete else set(fresh)
+
+    counts = {"unchanged": 0, "changed": 0, "added": 0, "removed": 0}
+    items = []
+    for pair in aligned:
+        counts[pair.status] += 1
+        previous = base_flagged.get(_digest(pair.base.text)) if pair.base else None
+        risk, source = None, None
+        if pair.other is not None:
+            digest = _digest(pair.other.text)
+            if digest in fresh:
+                risk, source = fresh[digest], "llm"
+            elif digest in known:
+                risk, source = known[digest], "stored"
+            elif digest in sent:
+                source = "llm"  # assessed just now and not flagged
+            # otherwise never assessed: no stored analysis covered it and it was not sent
+        if pair.status == "unchanged" and not include_unchanged and not (risk or previous):
+            continue
+        changed = pair.status != "unchanged"
+        items.append({
+            "status": pair.status,
+            "similarity": pair.similarity,
+            "base": _summary(pair.base, changed or include_unchanged),
+            "other": _summary(pair.other, changed or include_unchanged),
+            "risk": risk,
+            "previous_risk": previous,
+            "risk_source": source,
+        })
+
+    return {
+        "counts": counts,
+        "clauses_sent_to_llm": len(to_assess),
+        "clauses": items,
+    }
+
+
+def inherit_analysis(chains, base_text: str, base_analysis: Analysis, new_text: str,
+                     on_clause: Callable[[dict], None] = lambda clause: None) -> dict:
+    """Analysis of `new_text` that reuses `base_analysis` for every clause the two documents share.
+
+    Same result shape as a full analysis. Only changed or added clauses go
+    through the risk chain. The summary is always written afresh from
+    `new_text`, since a change anywhere can change what the document means.
+    """
+    started = time.monotonic()
+    base_clauses, new_clauses = segment_clauses(base_text), segment_clauses(new_text)
+    assessed, flagged = stored_assessment(base_analysis, base_clauses, chains.version("risk"))
+
+    inherited: List[dict] = []
+    to_assess: List[Clause] = []
+    for pair in align_clauses(base_clauses, new_clauses):
+        if pair.other is None:
+            continue
+        digest = _digest(pair.other.text)
+        if digest in assessed:
+            if digest in flagged:
+                item = attach_offsets([{**flagged[digest], "clause_id": pair.other.id}], new_clauses)[0]
+                inherited.append(item)
+                on_clause(item)
+            continue
+        if pair.other.categories:
+            to_assess.append(pair.other)
+
+    risk = stream_risk(chains, to_assess, new_clauses, on_clause) if to_assess else None
+    score = base_analysis.overall_risk_score
+    if risk and risk.overall_risk_score is not None:
+        score = max(score or 0.0, risk.overall_risk_score)
+
+    summary = chains.get("simplify").invoke({"text": new_text}).strip()
+
+    clauses = sorted(inherited + (risk.clauses if risk else []), key=lambda item: item.get("start", 0))
+    print(f"♻️ Reused {len(inherited)} flagged clauses from analysis ID {base_analysis.id}; "
+          f"{len(to_assess)} changed clauses sent to the AI")
+    return {
+        "overall_risk_score": score if score is not None else 0.5,
+        "high_risk_clauses": clauses,
+        "risk_complete": risk.complete if risk else True,
+        "simplified_summary": summary,
+        "processing_time": round(time.monotonic() - started, 3),
+        "prompt_version": chains.analysis_version,
+        "model_name": chains.model_name,
+        "inherited_from_id": base_analysis.id,
+    }
@@ -0,0 +1,11 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Loads backend/.env and then the working directory's .env, once per process."""
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+    load_dotenv()
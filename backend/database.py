@@ -2,11 +2,9 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from dotenv import load_dotenv
+from .config import load_env
 
-# Construct the path to the .env file
-env_path = os.path.join(os.path.dirname(__file__), '.env')
-load_dotenv(dotenv_path=env_path)
+load_env()
 
 # Database Configuration
 SUPABASE_DATABASE_URL = os.getenv("SUPABASE_DATABASE_URL")
@@ -0,0 +1,137 @@
+"""Per-endpoint time budgets and cancellation of LLM work nobody is waiting for.
+
+Each LLM-backed endpoint has a budget (LEXILENS_DEADLINE_<ENDPOINT>_SECONDS).
+A client can shorten it by sending the number of seconds it is still willing
+to wait in the X-Request-Deadline header. The chain is streamed in its own
+asyncio task while the request is watched. When the budget runs out or the
+client disconnects, the task is cancelled, which closes the model call
+mid-flight, and the text produced so far is handed back to the endpoint. On
+PostgreSQL the request's queries get the same budget as a statement timeout.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+DEADLINE_HEADER = "X-Request-Deadline"
+DEFAULT_BUDGET_SECONDS = float(os.getenv("LEXILENS_DEADLINE_SECONDS", "60"))
+BUDGETS = {
+    "qa": float(os.getenv("LEXILENS_DEADLINE_QA_SECONDS", str(DEFAULT_BUDGET_SECONDS))),
+    "scenario": float(os.getenv("LEXILENS_DEADLINE_SCENARIO_SECONDS", "90")),
+}
+DISCONNECT_POLL_SECONDS = 0.25
+
+# HTTP status for requests the client abandoned (nginx convention); nobody reads the response
+CLIENT_CLOSED_REQUEST = 499
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+class DeadlineError(Exception):
+    """The chain was cancelled; `partial` holds the text it had produced."""
+
+    def __init__(self, endpoint: str, partial: str):
+        super().__init__(endpoint)
+        self.endpoint = endpoint
+        self.partial = partial
+
+
+class DeadlineExceeded(DeadlineError):
+    pass
+
+
+class ClientDisconnected(DeadlineError):
+    pass
+
+
+class Deadline:
+    def __init__(self, endpoint: str, budget: float):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def request_deadline(request: Request, endpoint: str) -> Deadline:
+    """The endpoint's budget, shortened to the client's X-Request-Deadline when that is sooner."""
+    budget = BUDGETS.get(endpoint, DEFAULT_BUDGET_SECONDS)
+    try:
+        budget = min(budget, max(0.0, float(request.headers[DEADLINE_HEADER])))
+    except (KeyError, ValueError):
+        pass
+    return Deadline(endpoint, budget)
+
+
+def limit_statement_time(db: Session, deadline: Deadline):
+    """Caps every query of the session's current transaction at the remaining budget (PostgreSQL only)."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SET LOCAL statement_timeout = {max(1, int(deadline.remaining() * 1000))}"))
+
+
+def record(endpoint: str, outcome: str):
+    with _lock:
+        counts = _stats.setdefault(endpoint, {"completed": 0, "timed_out": 0, "partial": 0, "disconnected": 0})
+        counts[outcome] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "budgets": {**BUDGETS},
+            "endpoints": {endpoint: dict(counts) for endpoint, counts in sorted(_stats.items())},
+        }
+
+
+async def run_chain(request: Request, deadline: Deadline, chain, inputs: Dict[str, Any]) -> str:
+    """Streams `chain` to completion unless the deadline passes or the client goes away first.
+
+    Raises DeadlineExceeded or ClientDisconnected after cancelling the chain.
+    """
+    parts = []
+
+    async def consume() -> str:
+        async for chunk in chain.astream(inputs):
+            parts.append(chunk)
+        return "".join(parts)
+
+    task = asyncio.create_task(consume())
+    error: Optional[type] = None
+    try:
+        while error is None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                error = DeadlineExceeded
+                break
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, remaining))
+            if done:
+                result = task.result()
+                record(deadline.endpoint, "completed")
+                return result
+            if await request.is_disconnected():
+                error = ClientDisconnected
+    finally:
+        # Also reached when the server cancels the handler itself
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    partial = "".join(parts)
+    if error is ClientDisconnected:
+        outcome = "disconnected"
+    else:
+        outcome = "partial" if partial.strip() else "timed_out"
+    record(deadline.endpoint, outcome)
+    print(f"⏱️ Cancelled {deadline.endpoint} after {deadline.budget - deadline.remaining():.2f}s "
+          f"of a {deadline.budget:g}s budget ({outcome}, {len(partial)} characters produced)")
+    raise error(deadline.endpoint, partial)
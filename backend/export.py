@@ -0,0 +1,182 @@
+"""Streaming bulk export of a user's documents and their latest analyses.
+
+Rows are read through a server-side cursor in batches and written out as they
+arrive, so memory stays flat however large the library is. Output is flushed
+every CHUNK_BYTES, and exports that include document text fetch and write
+CONTENT_BATCH_SIZE rows at a time, so a batch of long contracts stays small.
+Stored clause JSON is passed through as-is rather than parsed and re-serialized.
+"""
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import Analysis, Document, analysis_is_finished
+
+BATCH_SIZE = 500
+# Rows per fetch and Parquet row group when full document text is exported
+CONTENT_BATCH_SIZE = 50
+# Buffered output is flushed once it reaches this many bytes
+CHUNK_BYTES = 1024 * 1024
+
+# Same bands the Streamlit dashboard uses for the overall risk score
+RISK_LEVEL_BOUNDS = {
+    "low": (None, 0.3),
+    "medium": (0.3, 0.7),
+    "high": (0.7, None),
+}
+
+ANALYSIS_COLUMNS = [
+    Analysis.id.label("analysis_id"),
+    Analysis.status.label("analysis_status"),
+    Analysis.overall_risk_score,
+    Analysis.simplified_summary,
+    Analysis.processing_time,
+    Analysis.prompt_version,
+    Analysis.model_name,
+    Analysis.created_at.label("analyzed_at"),
+]
+
+
+class ParquetUnavailable(RuntimeError):
+    pass
+
+
+def export_query(db: Session, owner_id: int, start: Optional[datetime], end: Optional[datetime],
+                 risk_level: Optional[str], include_content: bool):
+    latest = (
+        db.query(Analysis.document_id, func.max(Analysis.id).label("analysis_id"))
+        .filter(analysis_is_finished())
+        .group_by(Analysis.document_id)
+        .subquery()
+    )
+    columns = [Document.id.label("document_id"), Document.title, Document.filename, Document.uploaded_at]
+    if include_content:
+        columns += [Document.content, Document.clean_content]
+    query = (
+        db.query(*columns, *ANALYSIS_COLUMNS, Analysis.high_risk_clauses)
+        .outerjoin(latest, latest.c.document_id == Document.id)
+        .outerjoin(Analysis, Analysis.id == latest.c.analysis_id)
+        .filter(Document.owner_id == owner_id)
+    )
+    if start:
+        query = query.filter(Document.uploaded_at >= start)
+    if end:
+        query = query.filter(Document.uploaded_at < end)
+    if risk_level:
+        low, high = RISK_LEVEL_BOUNDS[risk_level]
+        if low is not None:
+            query = query.filter(Analysis.overall_risk_score > low)
+        if high is not None:
+            query = query.filter(Analysis.overall_risk_score <= high)
+        query = query.filter(Analysis.id.isnot(None))
+    # yield_per streams from a server-side cursor on PostgreSQL and fetches in batches everywhere
+    return query.order_by(Document.id).yield_per(batch_size(include_content))
+
+
+def batch_size(include_content: bool) -> int:
+    return CONTENT_BATCH_SIZE if include_content else BATCH_SIZE
+
+
+def _plain(row) -> dict:
+    record = dict(row._mapping)
+    record.pop("high_risk_clauses", None)
+    for key, value in record.items():
+        if isinstance(value, datetime):
+            record[key] = value.isoformat()
+    return record
+
+
+def iter_ndjson(rows) -> Iterator[bytes]:
+    """One JSON object per line; stored clause JSON is spliced in without a parse/dump round trip."""
+    buffer: List[bytes] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(_plain(row))
+        line = f'{line[:-1]}, "high_risk_clauses": {row.high_risk_clauses or "null"}}}\n'.encode("utf-8")
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back out in chunks while tracking its position."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def writable(self) -> bool:
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ParquetUnavailable("Parquet export requires the optional 'pyarrow' package.")
+
+
+def iter_parquet(rows, include_content: bool) -> Iterator[bytes]:
+    """Parquet file written one row group per batch (or per CHUNK_BYTES of text); needs the optional pyarrow package."""
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = [
+        ("document_id", pa.int64()), ("title", pa.string()), ("filename", pa.string()), ("uploaded_at", pa.string()),
+    ]
+    if include_content:
+        fields += [("content", pa.string()), ("clean_content", pa.string())]
+    fields += [
+        ("analysis_id", pa.int64()), ("analysis_status", pa.string()), ("overall_risk_score", pa.float64()), ("simplified_summary", pa.string()),
+        ("processing_time", pa.float64()), ("prompt_version", pa.string()), ("model_name", pa.string()),
+        ("analyzed_at", pa.string()), ("high_risk_clauses", pa.string()),
+    ]
+    schema = pa.schema(fields)
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        rows_per_group = batch_size(include_content)
+        batch: List[dict] = []
+        size = 0
+        for row in rows:
+            record = _plain(row)
+            record["high_risk_clauses"] = row.high_risk_clauses
+            batch.append(record)
+            size += sum(len(value) for value in record.values() if isinstance(value, str))
+            if len(batch) >= rows_per_group or size >= CHUNK_BYTES:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch.clear()
+                size = 0
+                yield sink.drain()
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    yield sink.drain()
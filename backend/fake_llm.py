@@ -0,0 +1,267 @@
+"""Deterministic stand-in for the Gemini chat model.
+
+Used by the benchmark harness (and anywhere else we need to exercise the
+chains without spending API quota). Enable it for the API with
+LEXILENS_LLM_BACKEND=fake.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from .text_cleaning import estimate_tokens
+
+
+class FakeLLMError(RuntimeError):
+    """Raised when the fake model injects a failure."""
+
+
+class FakeLLMTimeout(FakeLLMError, TimeoutError):
+    """Raised when the simulated latency exceeds the model's timeout."""
+
+
+def _env(name: str, tier: Optional[str], default: str) -> str:
+    """LEXILENS_FAKE_LLM_<TIER>_<NAME> if set (e.g. to make one tier fail), else LEXILENS_FAKE_LLM_<NAME>."""
+    generic = os.getenv(f"LEXILENS_FAKE_LLM_{name}", default)
+    return os.getenv(f"LEXILENS_FAKE_LLM_{tier.upper()}_{name}", generic) if tier else generic
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers every LexiLens prompt with canned, well-formed output.
+
+    Responses are derived from a hash of the prompt, so the same input always
+    produces the same output. Latency, failures and truncated responses are
+    configurable to mimic a remote model under load. Streaming splits the
+    response into chunks of `stream_chunk_chars` spread over the latency.
+    """
+    model_name: str = "fake-chat"
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    ms_per_1k_input_tokens: float = 0.0
+    failure_rate: float = 0.0
+    truncate_rate: float = 0.0
+    stream_chunk_chars: int = 80
+    timeout: Optional[float] = None  # seconds; slower responses raise FakeLLMTimeout
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls, model_name: str = "fake-chat", tier: Optional[str] = None,
+                 timeout: Optional[float] = None) -> "FakeChatModel":
+        return cls(
+            model_name=model_name,
+            latency_ms=float(_env("LATENCY_MS", tier, "50")),
+            jitter_ms=float(_env("JITTER_MS", tier, "0")),
+            ms_per_1k_input_tokens=float(_env("MS_PER_1K_TOKENS", tier, "0")),
+            failure_rate=float(_env("FAILURE_RATE", tier, "0")),
+            truncate_rate=float(_env("TRUNCATE_RATE", tier, "0")),
+            timeout=timeout,
+            seed=int(_env("SEED", tier, "0")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "lexilens-fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]):
+        """(response text, input tokens, delay in seconds, injected error or None) for a prompt.
+
+        Nothing sleeps here; the sync and async paths wait out the delay themselves (and then raise the error).
+        """
+        prompt = "\n".join(str(m.content) for m in messages)
+        input_tokens = estimate_tokens(prompt)
+
+        delay = self.latency_ms + input_tokens / 1000 * self.ms_per_1k_input_tokens
+        if self.jitter_ms:
+            delay += self._rng.uniform(0, self.jitter_ms)
+
+        if self.timeout is not None and delay / 1000 > self.timeout:
+            return "", input_tokens, self.timeout, FakeLLMTimeout(f"{self.model_name} timed out after {self.timeout:g}s")
+
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            return "", input_tokens, delay / 1000, FakeLLMError(f"Injected failure from {self.model_name}")
+
+        text = fake_response_for(prompt)
+        if self.truncate_rate and self._rng.random() < self.truncate_rate:
+            text = text[:self._rng.randint(1, max(1, len(text) - 1))]
+        return text, input_tokens, delay / 1000, None
+
+    def _pieces(self, text: str) -> List[str]:
+        return [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)] or [""]
+
+    def _result(self, text: str, input_tokens: int) -> ChatResult:
+        message = AIMessage(
+            content=text,
+            usage_metadata=self._usage(input_tokens, text),
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunk(self, piece: str, text: str, input_tokens: int, last: bool) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(
+            content=piece,
+            usage_metadata=self._usage(input_tokens, text) if last else None,
+            response_metadata={"model_name": self.model_name} if last else {},
+        ))
+
+    def _usage(self, input_tokens: int, text: str) -> dict:
+        output_tokens = estimate_tokens(text)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, input_tokens, delay, error = self._respond(messages)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self._result(text, input_tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Sleeping on the event loop (not in a thread) lets a cancelled request actually stop the call
+        text, input_tokens, delay, error = self._respond(messages)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self._result(text, input_tokens)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        text, input_tokens, delay, error = self._respond(messages)
+        if error:
+            time.sleep(delay)
+            raise error
+        pieces = self._pieces(text)
+        for index, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            chunk = self._chunk(piece, text, input_tokens, index == len(pieces) - 1)
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text, input_tokens, delay, error = self._respond(messages)
+        if error:
+            await asyncio.sleep(delay)
+            raise error
+        pieces = self._pieces(text)
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(delay / len(pieces))
+            chunk = self._chunk(piece, text, input_tokens, index == len(pieces) - 1)
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+# "[C12] (Termination, Payment) 4.1 Either party may..." lines produced by clauses.format_for_prompt
+CLAUSE_LINE = re.compile(r"^\[(C\d+)\] \([^)]*\) (.+)$", re.MULTILINE)
+# "[3] (High) The Company may..." lines produced by negotiation.format_for_prompt
+NEGOTIATION_LINE = re.compile(r"^\s*\[(\d+)\] \((\w+)\) ", re.MULTILINE)
+
+
+def _digest(prompt: str) -> int:
+    return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _sentences(prompt: str, limit: int) -> List[str]:
+    candidates = [s.strip() for s in re.split(r"(?<=[.;])\s+", prompt) if 40 <= len(s.strip()) <= 400]
+    return candidates[:limit]
+
+
+def fake_response_for(prompt: str) -> str:
+    """Builds a plausible answer for whichever LexiLens prompt this is."""
+    seed = _digest(prompt)
+    rng = random.Random(seed)
+
+    if "overall_risk_score" in prompt:
+        tagged = CLAUSE_LINE.findall(prompt)
+        if tagged:
+            picked = rng.sample(tagged, min(5, len(tagged)))
+            picked.sort(key=lambda item: int(item[0][1:]))
+        else:
+            picked = [("", sentence) for sentence in _sentences(prompt.split("Document text:")[-1], 5)]
+        clauses = [
+            {
+                **({"clause_id": clause_id} if clause_id else {}),
+                "clause": text,
+                "risk": rng.choice(["High", "Medium", "Low"]),
+                "confidence": round(rng.uniform(0.5, 0.99), 2),
+                "reason": "Synthetic reason generated by the fake model.",
+            }
+            for clause_id, text in picked
+        ]
+        return json.dumps({"overall_risk_score": round(rng.random(), 2), "clauses": clauses})
+
+    if '"negotiations"' in prompt:
+        return json.dumps({
+            "negotiations": [
+                {
+                    "clause_number": int(number),
+                    "suggestions": [
+                        f"Alternative wording #{i + 1} for clause {number} ({risk} risk): either party may terminate with thirty (30) days' written notice."
+                        for i in range(2)
+                    ],
+                }
+                for number, risk in NEGOTIATION_LINE.findall(prompt)
+            ]
+        })
+
+    if "qa_suggestions" in prompt:
+        return json.dumps({
+            "qa_suggestions": [
+                "What is the termination notice period?",
+                "When are payments due?",
+                "Who owns the intellectual property?",
+            ],
+            "scenario_suggestions": [
+                "What happens if a payment is missed?",
+                "What if either party breaches confidentiality?",
+                "What if the contract is terminated early?",
+            ],
+        })
+
+    if '"suggestions"' in prompt:
+        return json.dumps({
+            "suggestions": [
+                f"Alternative wording #{i + 1} ({seed % 1000}): either party may terminate with thirty (30) days' written notice."
+                for i in range(3)
+            ]
+        })
+
+    return f"Synthetic answer {seed % 10000}: based on the document, the relevant obligations are described in the cited clauses."
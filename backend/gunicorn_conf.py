@@ -0,0 +1,20 @@
+# Gunicorn settings for production:
+#   gunicorn -c backend/gunicorn_conf.py backend.main:app
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app (and, below, its heavy dependencies) once in the master so
+# workers fork with them already in memory and share the pages copy-on-write.
+# Set LEXILENS_PRELOAD_HEAVY=0 to keep the master light and import lazily per worker.
+preload_app = os.getenv("LEXILENS_PRELOAD_APP", "1") == "1"
+
+
+def on_starting(server):
+    if preload_app and os.getenv("LEXILENS_PRELOAD_HEAVY", "1") == "1":
+        from backend.llm_client import preload_heavy_modules
+        preload_heavy_modules()
+        server.log.info("Heavy modules preloaded in master")
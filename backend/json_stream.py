@@ -0,0 +1,158 @@
+"""Tolerant JSON parsing for LLM output, in one go or incrementally while streaming.
+
+Models asked for JSON still occasionally wrap it in Markdown fences, add a
+sentence before it, or stop mid-object when a response is cut off. parse_json
+accepts all of those and recovers the longest well-formed prefix.
+ArrayItemStream watches a streamed response and hands out each element of
+one top-level array as soon as that element is complete.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONRecoveryError(ValueError):
+    """Raised when not even a partial JSON value can be recovered from a response."""
+
+
+def _start(text: str) -> int:
+    positions = [p for p in (text.find("{"), text.find("[")) if p != -1]
+    return min(positions) if positions else -1
+
+
+def _truncated_candidates(text: str) -> List[str]:
+    """Prefixes of `text` cut after the last complete element, with open containers closed."""
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in CLOSERS:
+            stack.append(ch)
+            cuts.append((i + 1, "".join(CLOSERS[c] for c in reversed(stack))))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return [text[:i + 1]]
+            cuts.append((i + 1, "".join(CLOSERS[c] for c in reversed(stack))))
+        elif ch == ",":
+            cuts.append((i, "".join(CLOSERS[c] for c in reversed(stack))))
+    return [text[:position] + closers for position, closers in reversed(cuts)]
+
+
+def parse_json(text: str) -> Any:
+    """Parses the first JSON object or array in `text`, repairing fences, trailing commas and truncation."""
+    text = FENCE.sub("", text or "")
+    start = _start(text)
+    if start == -1:
+        raise JSONRecoveryError("No JSON object found in model output")
+    text = text[start:]
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(text)[0]
+    except json.JSONDecodeError:
+        pass
+    for candidate in _truncated_candidates(text):
+        try:
+            return json.loads(TRAILING_COMMA.sub(r"\1", candidate))
+        except json.JSONDecodeError:
+            continue
+    raise JSONRecoveryError("Could not recover JSON from model output")
+
+
+class ArrayItemStream:
+    """Incrementally extracts the objects of `{"<key>": [ {...}, {...} ]}` from streamed text.
+
+    feed() returns the items completed by each chunk. Items that fail to parse
+    on their own are skipped and counted in `malformed`; `complete` turns true
+    once the whole top-level value has been closed.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ""
+        self.malformed = 0
+        self.complete = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._in_array = False
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        items: List[Dict[str, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self.complete:
+            i, ch = self._pos, text[self._pos]
+            self._pos += 1
+            if not self._started:
+                self._started = ch == "{"
+                self._depth = 1 if self._started else 0
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start:i]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif ch in "{[":
+                if self._in_array and self._depth == 2 and ch == "{":
+                    self._item_start = i
+                elif self._depth == 1 and ch == "[" and self._current_key == self.key:
+                    self._in_array = True
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and self._item_start is not None:
+                    items.extend(self._parse_item(text[self._item_start:i + 1]))
+                    self._item_start = None
+                elif self._in_array and self._depth == 1:
+                    self._in_array = False
+                elif self._depth == 0:
+                    self.complete = True
+        return items
+
+    def _parse_item(self, raw: str) -> List[Dict[str, Any]]:
+        try:
+            item = json.loads(TRAILING_COMMA.sub(r"\1", raw))
+        except json.JSONDecodeError:
+            self.malformed += 1
+            return []
+        return [item] if isinstance(item, dict) else []
+
+    def result(self) -> Dict[str, Any]:
+        """Best-effort parse of everything received so far (empty dict if nothing is recoverable)."""
+        try:
+            value = parse_json(self.text)
+        except JSONRecoveryError:
+            return {}
+        return value if isinstance(value, dict) else {}
@@ -0,0 +1,113 @@
+"""Lazily constructed LLM clients, model router and chain registry.
+
+LangChain and the Google GenAI client take most of the API's import time, so
+nothing here imports them until the first request that actually needs a chain.
+One client is built per model tier (see model_router.py); tiers configured
+with the same model share a client.
+"""
+import importlib
+import os
+import threading
+
+from .config import load_env
+from .model_router import ModelRouter, tier_models, tier_timeout
+
+load_env()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your-api-key-here")
+LLM_BACKEND = os.getenv("LEXILENS_LLM_BACKEND", "gemini")  # "gemini" or "fake" (offline benchmarks)
+# Per-tier retries inside the client; after that the router falls back to another tier
+MODEL_MAX_RETRIES = int(os.getenv("LEXILENS_MODEL_MAX_RETRIES", "2"))
+
+# Modules that dominate cold-start time; see benchmarks/import_time.py
+HEAVY_MODULES = (
+    "fitz",
+    "pdfplumber",
+    "langchain.prompts",
+    "langchain_core.output_parsers",
+    "langchain_google_genai",
+)
+
+_lock = threading.Lock()
+_router = None
+_chains = None
+_init_failed = False
+
+
+def llm_configured() -> bool:
+    return LLM_BACKEND == "fake" or bool(GEMINI_API_KEY and GEMINI_API_KEY != "your-api-key-here")
+
+
+def llm_available() -> bool:
+    """Whether chains can be served, without forcing the client to be built."""
+    return llm_configured() and not _init_failed
+
+
+def _build_llm(model: str, tier: str):
+    if LLM_BACKEND == "fake":
+        from .fake_llm import FakeChatModel
+        return FakeChatModel.from_env(model, tier=tier, timeout=tier_timeout(tier))
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=model, google_api_key=GEMINI_API_KEY, timeout=tier_timeout(tier), max_retries=MODEL_MAX_RETRIES
+    )
+
+
+def _build_router():
+    if LLM_BACKEND == "fake":
+        print("🧪 Using fake LLM backend (no Gemini calls will be made)")
+    clients = {}
+    llms = {}
+    for tier, model in tier_models().items():
+        if model not in clients:
+            clients[model] = _build_llm(model, tier)
+        llms[tier] = clients[model]
+    return ModelRouter(llms)
+
+
+def get_router():
+    """Returns the process-wide model router, building its clients on first use (None if unavailable)."""
+    global _router, _init_failed
+    if _router is not None or _init_failed:
+        return _router
+    with _lock:
+        if _router is None and not _init_failed:
+            if not llm_configured():
+                print("❌ ERROR: GEMINI_API_KEY not found or not set in .env file.")
+                _init_failed = True
+                return None
+            try:
+                _router = _build_router()
+                print(f"✅ LLM initialized successfully ({_router.model_name})")
+            except Exception as e:
+                print(f"❌ ERROR initializing LLM: {str(e)}")
+                _init_failed = True
+    return _router
+
+
+def get_chains():
+    """Returns the ChainRegistry, compiling every chain once on first use (None if no LLM)."""
+    global _chains
+    if _chains is not None:
+        return _chains
+    router = get_router()
+    if router is None:
+        return None
+    with _lock:
+        if _chains is None:
+            from .chains import ChainRegistry
+            _chains = ChainRegistry(router)
+    return _chains
+
+
+def preload_heavy_modules():
+    """Imports the heavy dependencies without building any client.
+
+    Called from the gunicorn master (see gunicorn_conf.py) so forked workers
+    share the imported modules copy-on-write. The LLM client itself is still
+    built lazily inside each worker, as its network channel must not be
+    created before fork.
+    """
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    importlib.import_module(f"{__package__}.chains")
@@ -1,44 +1,54 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Form, BackgroundTasks
+from fastapi import FastAPI, APIRouter, UploadFile, File, Depends, HTTPException, status, Form, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 import shutil
 import os
-import fitz
-import pdfplumber
 import json
+import time
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 
-# LangChain Imports (Modernized)
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
-# Local Imports
+# Local Imports (LangChain, Gemini and the PDF libraries are imported lazily, see llm_client.py)
 from .database import SessionLocal, get_db
-from .models import User, Document, Analysis, create_tables
-from .auth import authenticate_user, create_access_token, get_current_user, get_password_hash
-
-# Load environment variables FIRST
-from dotenv import load_dotenv
-load_dotenv()
-
-# --- Gemini API Configuration ---
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your-api-key-here")
-llm = None  # Initialize llm as None
+from .models import (
+    User, Document, Analysis, ClauseSuggestion, create_tables,
+    ANALYSIS_COMPLETE, ANALYSIS_FAILED, ANALYSIS_PARTIAL, ANALYSIS_RUNNING, analysis_is_finished
+)
+from .auth import authenticate_user, create_access_token, get_current_user, get_password_hash, require_admin
+from .llm_client import get_chains, get_router, llm_available, preload_heavy_modules
+from .text_cleaning import estimate_tokens, normalize_pages
+from .qa_cache import document_key, qa_cache
+from .negotiation import PRECOMPUTE as PRECOMPUTE_NEGOTIATIONS, analysis_clauses, clause_hash, find_suggestions, precompute_negotiations, stored_suggestions
+from .export import ParquetUnavailable, export_query, iter_ndjson, iter_parquet, require_pyarrow
+from .clauses import segment_clauses, candidate_clauses
+from .json_stream import parse_json
+from .risk_analysis import stream_risk
+from .compare import compare_documents, inherit_analysis
+from .near_duplicates import ENABLED as NEAR_DUP_ENABLED, decode, find_near_duplicates, index_document, remove_document
+from .reanalysis import ReanalysisScheduler
+from .model_router import track_models
+from .analysis_queue import AnalysisQueue
+from .analysis_recovery import RecoverySweeper, duplicate_job, heartbeat, unanalyzed_documents
+from .usage import attribute as attribute_usage, record_cache_hit, rollup as usage_rollup, writer as usage_writer
+from .deadlines import (
+    CLIENT_CLOSED_REQUEST, ClientDisconnected, DeadlineExceeded, limit_statement_time, request_deadline, run_chain,
+    stats as deadline_stats
+)
 
-# Validate API key on startup
-if not GEMINI_API_KEY or GEMINI_API_KEY == "your-api-key-here":
-    print("❌ ERROR: GEMINI_API_KEY not found or not set in .env file.")
-else:
-    try:
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=GEMINI_API_KEY)
-        print("✅ LLM initialized successfully")
-    except Exception as e:
-        print(f"❌ ERROR initializing LLM: {str(e)}")
-        llm = None
+# Set LEXILENS_PRELOAD=1 to import heavy modules and compile chains at worker startup
+# instead of on the first request that needs them.
+PRELOAD = os.getenv("LEXILENS_PRELOAD", "0") == "1"
+# Set LEXILENS_REANALYSIS_ENABLED=1 to refresh stale analyses in the background.
+# Enable it in a single process only; every worker that starts it runs its own scheduler.
+REANALYSIS_ENABLED = os.getenv("LEXILENS_REANALYSIS_ENABLED", "0") == "1"
+LAST_VIEWED_RESOLUTION = timedelta(minutes=5)
+# JSON bodies at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("LEXILENS_GZIP_MIN_BYTES", "1000"))
 
 # --- FastAPI Lifespan ---
 @asynccontextmanager
@@ -59,16 +69,25 @@ async def lifespan(app: FastAPI):
             print("✅ Default test user created (test@example.com / test123)")
     finally:
         db.close()
+
+    if PRELOAD:
+        preload_heavy_modules()
+        get_chains()
+        print("✅ Heavy modules and prompt chains preloaded")
+    analysis_queue.start()
+    requeue_unanalyzed_documents()
+    recovery_sweeper.start()
+    usage_writer.start()
+    if REANALYSIS_ENABLED:
+        reanalysis_scheduler.start()
     yield
+    reanalysis_scheduler.stop()
+    recovery_sweeper.stop()
+    analysis_queue.stop()
+    usage_writer.stop()
     print("👋 Shutting down LexiLens AI API...")
 
-# --- FastAPI App Initialization ---
-app = FastAPI(
-    title="LexiLens AI API",
-    description="Production-Grade Legal Document Intelligence Platform API",
-    version="1.0.0",
-    lifespan=lifespan
-)
+router = APIRouter()
 
 # --- Pydantic Schemas ---
 class DocumentOut(BaseModel):
@@ -79,7 +98,9 @@ class DocumentOut(BaseModel):
     class Config: from_attributes = True
 
 class DocumentDetail(DocumentOut):
-    content: str
+    content: str  # raw extraction
+    prompt_text: str  # cleaned text the analysis saw; clause start/end offsets index into this
+    tokens_saved: Optional[int] = None
     analysis: Optional[dict] = None
 
 class ScenarioRequest(BaseModel):
@@ -88,6 +109,7 @@ class ScenarioRequest(BaseModel):
 class ScenarioResponse(BaseModel):
     scenario: str
     analysis: str
+    status: Literal["complete", "partial"] = "complete"  # "partial": cut off at the request deadline
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -97,6 +119,11 @@ class AnalyzeImmediateResponse(BaseModel):
     message: str
     document_id: int
     filename: str
+    tokens_saved: int = 0
+    near_duplicate_of: Optional[int] = None
+    similarity: Optional[float] = None
+    queue_lane: Optional[str] = None
+    queue_position: Optional[int] = None  # None once the analysis is running
 
 class RegisterResponse(BaseModel):
     message: str
@@ -115,61 +142,158 @@ class DocumentQAResponse(BaseModel):
     question: str
     answer: str
     document_id: int
+    cached: bool = False
+    similarity: Optional[float] = None
+    status: Literal["complete", "partial"] = "complete"  # "partial": cut off at the request deadline
 
 class NegotiateRequest(BaseModel):
     clause_text: str
     risk_level: str
+    document_id: Optional[int] = None
 
 class NegotiateResponse(BaseModel):
     original_clause: str
     suggestions: List[str]
+    cached: bool = False
+
+class ClauseNegotiation(BaseModel):
+    clause_index: int
+    clause: str
+    risk: str
+    suggestions: List[str]
+
+class DocumentNegotiationsResponse(BaseModel):
+    document_id: int
+    analysis_id: int
+    negotiations: List[ClauseNegotiation]
+
+class CompareRequest(BaseModel):
+    base_document_id: int
+    other_document_id: int
+    include_unchanged: bool = False
+
+class CompareResponse(BaseModel):
+    base_document_id: int
+    other_document_id: int
+    base_analysis_id: Optional[int] = None
+    other_analysis_id: Optional[int] = None
+    counts: dict
+    clauses_sent_to_llm: int
+    clauses: List[dict]
+
+class ReanalysisStatus(BaseModel):
+    running: bool
+    per_minute: float
+    prompt_version: Optional[str] = None
+    model_name: Optional[str] = None
+    pending: Optional[int] = None
+    completed: int
+    failed_document_ids: List[int]
+    last_document_id: Optional[int] = None
+    started_at: Optional[datetime] = None
+
+class ModelRoutingStats(BaseModel):
+    tiers: dict
+    routes: dict
+    fast_max_tokens: int
+    large_min_tokens: int
+    calls: List[dict]
+
+class QueuedAnalysis(BaseModel):
+    document_id: int
+    state: Literal["queued", "running"]
+    lane: Literal["interactive", "bulk"]
+    position: Optional[int] = None  # 1 = next analysis to start across all users
+    estimated_tokens: int
+    queued_at: datetime
+
+class AnalysisQueueStats(BaseModel):
+    workers: int
+    per_user_concurrency: int
+    quantum_tokens: int
+    running: int
+    queued: dict
+    completed: int
+    owners: List[dict]
+
+class UsageRow(BaseModel):
+    key: Optional[str] = None  # user id, document id, chain, model or endpoint; None for unattributed calls
+    calls: int
+    cache_hits: int
+    failed: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+
+class UsageRollup(BaseModel):
+    group_by: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    rows: List[UsageRow]
+    writer: Optional[dict] = None  # rows still buffered are not in the totals yet
+
+class DeadlineStats(BaseModel):
+    budgets: dict
+    endpoints: dict
 
 class SuggestionResponse(BaseModel):
     qa_suggestions: List[str]
     scenario_suggestions: List[str]
 
 # --- Helper Functions ---
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
+def extract_pages_from_pdf(file_path: str) -> List[str]:
+    import fitz
+    import pdfplumber
+
+    pages = []
     try:
         with fitz.open(file_path) as doc:
             for page in doc:
-                text += page.get_text()
+                pages.append(page.get_text())
     except Exception as e:
         print(f"PyMuPDF failed: {e}, trying pdfplumber...")
+        pages = []
         try:
             with pdfplumber.open(file_path) as pdf:
                 for page in pdf.pages:
-                    text += page.extract_text() or ""
+                    pages.append(page.extract_text() or "")
         except Exception as e2:
             raise IOError(f"Could not extract text from PDF: {e} / {e2}")
-    if not text.strip():
+    if not "".join(pages).strip():
         raise ValueError("PDF appears to be empty or contains no extractable text")
-    return text
+    return pages
+
+def extract_text_from_pdf(file_path: str) -> str:
+    return "".join(extract_pages_from_pdf(file_path))
 
-def analyze_document_with_ai(text: str) -> dict:
-    if llm is None:
+def analyze_document_with_ai(text: str, on_clause=None) -> dict:
+    """Risk and summary analysis; flagged clauses are passed to `on_clause` as they stream in."""
+    chains = get_chains()
+    if chains is None:
         return {"error": "GEMINI_API_KEY not configured properly"}
+    started = time.monotonic()
     try:
-        parser = StrOutputParser()
-        risk_prompt = PromptTemplate.from_template(
-            """Analyze the following legal document for risk. Identify clauses related to Termination, Payment terms, Liability, Intellectual property, Confidentiality, and Dispute resolution. For each, provide: 'clause' (quoted text), 'risk' (High, Medium, or Low), 'confidence' (0-1 score), and 'reason'. Also, calculate an 'overall_risk_score' (0-1). Document text: {text}. Output ONLY a valid JSON object with keys: 'overall_risk_score', 'clauses' (a list of dictionaries)."""
-        )
-        risk_chain = risk_prompt | llm | parser
-        risk_result_str = risk_chain.invoke({"text": text})
-        risk_result = json.loads(risk_result_str.strip().replace("```json", "").replace("```", ""))
+        # Only clauses the local pre-classifier tagged go to the risk prompt
+        clauses = segment_clauses(text)
+        candidates = candidate_clauses(clauses) or [c for c in clauses if not c.is_heading]
+        print(f"✂️ Risk prompt covers {len(candidates)} of {len(clauses)} clauses")
+
+        risk = stream_risk(chains, candidates, clauses, on_clause or (lambda clause: None))
+        if not risk.complete:
+            print(f"⚠️ Risk analysis gave up after {risk.attempts} attempts; keeping {len(risk.clauses)} flagged clauses")
+
+        simplified = chains.get("simplify").invoke({"text": text})
 
-        simplify_prompt = PromptTemplate.from_template(
-            """Simplify the following legal document into plain English. Focus on key obligations, rights, and risks. Document text: {text}. Provide a concise simplified summary."""
-        )
-        simplify_chain = simplify_prompt | llm | parser
-        simplified = simplify_chain.invoke({"text": text})
-        
         return {
-            "overall_risk_score": risk_result.get("overall_risk_score", 0.5),
-            "high_risk_clauses": risk_result.get("clauses", []),
+            "overall_risk_score": risk.overall_risk_score if risk.overall_risk_score is not None else 0.5,
+            "high_risk_clauses": risk.clauses,
+            "risk_complete": risk.complete,
             "simplified_summary": simplified.strip(),
-            "processing_time": 5.0
+            "processing_time": round(time.monotonic() - started, 3),
+            "prompt_version": chains.analysis_version,
+            "model_name": chains.model_name
         }
     except Exception as e:
         print(f"AI Analysis Error: {str(e)}")
@@ -177,34 +301,175 @@ def analyze_document_with_ai(text: str) -> dict:
 
 # --- Background Task Worker ---
 def run_ai_analysis_and_save(doc_id: int, db: Session):
+    """Writes a "running" Analysis row right away and commits each flagged clause as it is parsed."""
     print(f"🔬 Starting background analysis for document ID: {doc_id}")
     doc = db.query(Document).filter(Document.id == doc_id).first()
-    if not doc:
-        print(f"❌ Could not find document ID {doc_id} for background analysis.")
+    chains = get_chains()
+    if not doc or chains is None:
+        print(f"❌ Could not start background analysis for document ID {doc_id} (document or AI service missing).")
+        db.close()
+        return
+    if duplicate_job(db, doc_id, chains.analysis_version, chains.model_name):
+        print(f"⏭️ Skipping analysis of document ID {doc_id}: another process is running or has finished it.")
+        db.rollback()
         db.close()
         return
 
-    try:
-        analysis_result = analyze_document_with_ai(doc.content)
-        analysis = Analysis(
-            document_id=doc.id,
-            overall_risk_score=analysis_result.get("overall_risk_score", 0.0),
-            high_risk_clauses=json.dumps(analysis_result.get("high_risk_clauses", [])),
-            simplified_summary=analysis_result.get("simplified_summary", ""),
-            processing_time=analysis_result.get("processing_time", 0.0)
-        )
-        db.add(analysis)
+    started = time.monotonic()
+    analysis = Analysis(
+        document_id=doc.id,
+        high_risk_clauses="[]",
+        status=ANALYSIS_RUNNING,
+        prompt_version=chains.analysis_version,
+        model_name=chains.model_name
+    )
+    db.add(analysis)
+    db.commit()
+    flagged = []
+
+    def persist_clause(clause: dict):
+        flagged.append(clause)
+        analysis.high_risk_clauses = json.dumps(flagged)
         db.commit()
-        print(f"✅ Background analysis for document ID {doc_id} complete and saved.")
+
+    with attribute_usage("analysis", doc.owner_id, doc.id), heartbeat(analysis.id):
+        try:
+            with track_models() as models_used:
+                # Inside the try so a failed near-duplicate lookup marks the running row as failed
+                base = inheritable_analysis(db, doc, chains) if NEAR_DUP_ENABLED else None
+                if base:
+                    base_doc, base_analysis = base
+                    analysis_result = inherit_analysis(chains, base_doc.prompt_text, base_analysis, doc.prompt_text, on_clause=persist_clause)
+                else:
+                    analysis_result = analyze_document_with_ai(doc.prompt_text, on_clause=persist_clause)
+            analysis.models_used = json.dumps(models_used)
+            analysis.overall_risk_score = analysis_result.get("overall_risk_score", 0.0)
+            analysis.high_risk_clauses = json.dumps(analysis_result.get("high_risk_clauses", flagged))
+            analysis.simplified_summary = analysis_result.get("simplified_summary", "")
+            analysis.processing_time = analysis_result.get("processing_time", 0.0)
+            analysis.inherited_from_id = analysis_result.get("inherited_from_id")
+            # Candidate clauses the risk model never reached are unassessed, not "not risky"
+            analysis.status = ANALYSIS_COMPLETE if analysis_result.get("risk_complete", True) else ANALYSIS_PARTIAL
+            db.commit()
+            qa_cache.invalidate(doc_id)
+            print(f"✅ Background analysis for document ID {doc_id} saved ({analysis.status}).")
+
+            if PRECOMPUTE_NEGOTIATIONS:
+                stored = precompute_negotiations(db, analysis, chains)
+                print(f"✍️ Precomputed negotiation suggestions for {len(stored)} clauses of document ID {doc_id}")
+        except Exception as e:
+            print(f"❌ Background analysis for document ID {doc_id} failed: {str(e)}")
+            db.rollback()
+            analysis.status = ANALYSIS_FAILED
+            analysis.processing_time = round(time.monotonic() - started, 3)
+            db.commit()
+        finally:
+            db.close()
+
+def inheritable_analysis(db: Session, doc: Document, chains) -> Optional[Tuple[Document, Analysis]]:
+    """Current-version analysis of the closest near-duplicate upload, if there is one to build on.
+
+    Analyses that were themselves inherited, or that did not cover every candidate clause, are
+    skipped, so every reuse starts from a full analysis.
+    """
+    if not doc.minhash:
+        return None
+    for candidate_id, similarity in find_near_duplicates(db, doc.owner_id, decode(doc.minhash), exclude_id=doc.id):
+        analysis = latest_analysis(db, candidate_id)
+        if (analysis and analysis.inherited_from_id is None and analysis.status != ANALYSIS_PARTIAL
+                and analysis.prompt_version == chains.analysis_version and analysis.model_name == chains.model_name):
+            print(f"🔗 Document ID {doc.id} is a near-duplicate of document ID {candidate_id} (similarity {similarity:.2f})")
+            return db.query(Document).filter(Document.id == candidate_id).first(), analysis
+    return None
+
+def current_analysis_versions():
+    chains = get_chains()
+    return (chains.analysis_version, chains.model_name) if chains else None
+
+reanalysis_scheduler = ReanalysisScheduler(run_ai_analysis_and_save, current_analysis_versions)
+# Sessions are opened when a job starts, not while it waits in the queue
+analysis_queue = AnalysisQueue(lambda doc_id: run_ai_analysis_and_save(doc_id, SessionLocal()))
+def requeue_unanalyzed_documents():
+    """Queues documents whose analysis never ran, e.g. because a restart dropped the in-memory queue."""
+    db = SessionLocal()
+    try:
+        pending = unanalyzed_documents(db)
     except Exception as e:
-        print(f"❌ Background analysis for document ID {doc_id} failed: {str(e)}")
+        print(f"❌ Could not look for unanalyzed documents: {e}")
+        return
     finally:
         db.close()
+    for item in pending:
+        analysis_queue.submit(item.document_id, item.owner_id, item.tokens)
+    if pending:
+        print(f"📥 Queued {len(pending)} documents that have no analysis yet")
+
+# Marks analyses left "running" by a dead process failed and queues their documents again
+recovery_sweeper = RecoverySweeper(
+    lambda pending: analysis_queue.submit(pending.document_id, pending.owner_id, pending.tokens)
+)
+
+def latest_analysis(db: Session, document_id: int) -> Optional[Analysis]:
+    """Most recent finished (complete or partial) analysis of a document."""
+    return (
+        db.query(Analysis)
+        .filter(Analysis.document_id == document_id, analysis_is_finished())
+        .order_by(Analysis.created_at.desc())
+        .first()
+    )
+
+def displayed_analysis(db: Session, document_id: int, *columns):
+    """Latest finished analysis, or the one still running when none has finished yet."""
+    query = db.query(*columns).filter(Analysis.document_id == document_id).order_by(Analysis.created_at.desc())
+    return (
+        query.filter(analysis_is_finished()).first()
+        or query.filter(Analysis.status == ANALYSIS_RUNNING).first()
+    )
+
+def document_validators(document_id: int, analysis: Optional[tuple], uploaded_at: datetime):
+    """Weak ETag and Last-Modified for a document detail response, from ids and timestamps only."""
+    analysis_id, analyzed_at = analysis if analysis else (0, None)
+    last_modified = max(filter(None, [uploaded_at, analyzed_at]), default=uploaded_at)
+    # A running analysis changes with every clause it persists, so the ETag carries its update time
+    revision = f"-{int(analyzed_at.timestamp() * 1000000):x}" if analyzed_at else ""
+    return f'W/"doc{document_id}-a{analysis_id}{revision}"', last_modified.replace(microsecond=0)
+
+def not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def store_single_suggestion(db: Session, owner_id: int, request: "NegotiateRequest", suggestions: List[str], version: str):
+    """Keeps a one-off /negotiate-clause result if the clause belongs to the document's latest analysis."""
+    doc = db.query(Document).filter(Document.id == request.document_id, Document.owner_id == owner_id).first()
+    analysis = latest_analysis(db, doc.id) if doc else None
+    if not analysis:
+        return
+    target = clause_hash(request.clause_text)
+    for index, clause in enumerate(json.loads(analysis.high_risk_clauses or "[]")):
+        if clause_hash(clause.get("clause", "")) == target:
+            db.add(ClauseSuggestion(
+                analysis_id=analysis.id,
+                clause_index=index,
+                clause_hash=target,
+                risk_level=request.risk_level,
+                suggestions=json.dumps(suggestions),
+                prompt_version=version
+            ))
+            db.commit()
+            return
 
 # --- API Endpoints ---
-@app.post("/analyze", response_model=AnalyzeImmediateResponse, tags=["Analysis"])
+@router.post("/analyze", response_model=AnalyzeImmediateResponse, tags=["Analysis"])
 async def analyze_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -214,25 +479,42 @@ async def analyze_document(
         with open(temp_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        text = extract_text_from_pdf(temp_path)
+        pages = extract_pages_from_pdf(temp_path)
+        normalized = normalize_pages(pages)
         file_title = os.path.splitext(file.filename)[0].replace("_", " ").replace("-", " ").title()
         
         doc = Document(
             title=file_title,
             filename=file.filename,
-            content=text,
+            content="".join(pages),
+            clean_content=normalized.text,
+            tokens_saved=normalized.tokens_saved,
             owner_id=current_user.id
         )
         db.add(doc)
         db.commit()
         db.refresh(doc)
-        
-        background_tasks.add_task(run_ai_analysis_and_save, doc.id, SessionLocal())
-        
+        print(f"🧹 Document ID {doc.id}: stripped {normalized.removed_lines} boilerplate lines, "
+              f"~{normalized.tokens_saved} of {normalized.raw_tokens} tokens saved per prompt")
+
+        matches = []
+        if NEAR_DUP_ENABLED:
+            signature = index_document(db, doc, doc.prompt_text)
+            db.commit()
+            matches = find_near_duplicates(db, current_user.id, signature, exclude_id=doc.id)
+
+        job = analysis_queue.submit(doc.id, current_user.id, estimate_tokens(doc.prompt_text))
+        queued = analysis_queue.position(current_user.id, doc.id)
+
         return AnalyzeImmediateResponse(
-            message="Document uploaded successfully. Analysis has started in the background.",
+            message="Document uploaded successfully. Analysis has been queued and will run in the background.",
             document_id=doc.id,
-            filename=file.filename
+            filename=file.filename,
+            tokens_saved=normalized.tokens_saved,
+            near_duplicate_of=matches[0][0] if matches else None,
+            similarity=round(matches[0][1], 4) if matches else None,
+            queue_lane=job.lane,
+            queue_position=queued["position"] if queued else None
         )
     except (IOError, ValueError) as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -240,41 +522,52 @@ async def analyze_document(
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
-@app.post("/scenario/{document_id}", response_model=ScenarioResponse, tags=["Analysis"])
+@router.post("/scenario/{document_id}", response_model=ScenarioResponse, tags=["Analysis"])
 async def analyze_scenario_for_document(
     document_id: int,
     request: ScenarioRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Analyzes a hypothetical scenario against the document within the scenario deadline
+    (shortened by an X-Request-Deadline header); an answer cut off at the deadline comes back as "partial".
+    """
+    deadline = request_deadline(http_request, "scenario")
+    limit_statement_time(db, deadline)
     doc = db.query(Document).filter(Document.id == document_id, Document.owner_id == current_user.id).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    scenario_prompt = PromptTemplate.from_template(
-        """Analyze this legal scenario: "{scenario}"\n\nBased ONLY on the following document content, provide actionable advice and potential risks.\n\nDocument Content:\n"{content}"\n\nYour structured response should include:\n- A summary of the scenario.\n- Potential risks based on the document.\n- Recommended actions."""
-    )
-    parser = StrOutputParser()
-    scenario_chain = scenario_prompt | llm | parser
-    analysis = scenario_chain.invoke({"scenario": request.scenario_text, "content": doc.content})
+    try:
+        with attribute_usage("scenario", current_user.id, document_id):
+            analysis = await run_chain(http_request, deadline, get_chains().get("scenario"),
+                                       {"scenario": request.scenario_text, "content": doc.prompt_text})
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except DeadlineExceeded as e:
+        if not e.partial.strip():
+            raise HTTPException(status_code=504, detail=f"Scenario analysis did not finish within {deadline.budget:g} seconds.")
+        return ScenarioResponse(scenario=request.scenario_text, analysis=e.partial, status="partial")
     return ScenarioResponse(scenario=request.scenario_text, analysis=analysis)
 
 # ... (Keep all your other endpoints: /register, /token, /user/documents, etc. They are correct)
-@app.get("/", tags=["General"])
+@router.get("/", tags=["General"])
 async def root():
     return {"message": "Welcome to LexiLens AI API"}
 
-@app.get("/health", response_model=HealthResponse, tags=["General"])
+@router.get("/health", response_model=HealthResponse, tags=["General"])
 async def health_check():
     return HealthResponse(
-        status="healthy" if llm is not None else "degraded",
+        status="healthy" if llm_available() else "degraded",
         message="LexiLens AI API is running",
-        api_key_status="configured" if llm is not None else "not_configured",
+        api_key_status="configured" if llm_available() else "not_configured",
         database="supabase_connected" if os.getenv("SUPABASE_DATABASE_URL") else "sqlite_fallback",
-        llm_available=llm is not None
+        llm_available=llm_available()
     )
 
-@app.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED, tags=["Authentication"])
+@router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED, tags=["Authentication"])
 async def register(email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(User.email == email).first()
     if existing_user:
@@ -289,7 +582,7 @@ async def register(email: str = Form(...), password: str = Form(...), db: Sessio
     return RegisterResponse(message="User created successfully. Please login.")
 
 
-@app.post("/token", response_model=TokenResponse, tags=["Authentication"])
+@router.post("/token", response_model=TokenResponse, tags=["Authentication"])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
@@ -301,44 +594,98 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     access_token = create_access_token(data={"sub": user.email})
     return TokenResponse(access_token=access_token, token_type="bearer")
 
-@app.get("/user/documents", response_model=List[DocumentOut], tags=["Documents"])
+@router.get("/user/documents", response_model=List[DocumentOut], tags=["Documents"])
 async def get_user_documents(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     return db.query(Document).filter(Document.owner_id == current_user.id).order_by(Document.uploaded_at.desc()).all()
 
-@app.post("/document/{document_id}/query", response_model=DocumentQAResponse, tags=["Analysis"])
+def stream_export(owner_id: int, export_format: str, start: Optional[datetime], end: Optional[datetime],
+                  risk_level: Optional[str], include_content: bool):
+    # The export outlives the request-scoped session, so it opens and closes its own
+    db = SessionLocal()
+    try:
+        rows = export_query(db, owner_id, start, end, risk_level, include_content)
+        if export_format == "parquet":
+            yield from iter_parquet(rows, include_content)
+        else:
+            yield from iter_ndjson(rows)
+    finally:
+        db.close()
+
+@router.get("/user/export", tags=["Documents"])
+async def export_user_documents(
+    format: Literal["ndjson", "parquet"] = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    risk_level: Optional[Literal["low", "medium", "high"]] = None,
+    include_content: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams every document of the user with its latest analysis, as NDJSON or a Parquet file.
+    Filters on upload date range and overall risk level; include_content=false leaves out document bodies.
+    """
+    if format == "parquet":
+        try:
+            require_pyarrow()
+        except ParquetUnavailable as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/x-ndjson"
+    filename = f"lexilens-export-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        stream_export(current_user.id, format, start, end, risk_level, include_content),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/document/{document_id}/query", response_model=DocumentQAResponse, tags=["Analysis"])
 async def query_document(
     document_id: int,
     request: DocumentQARequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Answers a specific question based on the content of a single document.
+    The answer has to arrive within the Q&A deadline (shortened by an X-Request-Deadline header);
+    one cut off at the deadline comes back as "partial" and is not cached.
     """
+    deadline = request_deadline(http_request, "qa")
+    limit_statement_time(db, deadline)
     doc = db.query(Document).filter(Document.id == document_id, Document.owner_id == current_user.id).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    qa_prompt = PromptTemplate.from_template(
-        """
-        You are an AI assistant specialized in legal document analysis.
-        Answer the following question based ONLY on the provided document content.
-        If the answer is not in the document, state that clearly. Be concise and precise.
+    chains = get_chains()
+    qa_version = chains.version("qa")
+    analysis = displayed_analysis(db, document_id, Analysis.id)
+    cache_key = document_key(doc.owner_id, doc.id, doc.uploaded_at, analysis.id if analysis else None)
+    cached = qa_cache.lookup(cache_key, request.question, qa_version)
+    if cached:
+        entry, similarity = cached
+        with attribute_usage("qa", current_user.id, document_id):
+            record_cache_hit("qa")
+        return DocumentQAResponse(
+            question=request.question,
+            answer=entry.answer,
+            document_id=document_id,
+            cached=True,
+            similarity=round(similarity, 4)
+        )
 
-        Question: "{question}"
-        
-        Document Content:
-        "{content}"
-        """
-    )
-    
-    parser = StrOutputParser()
-    qa_chain = qa_prompt | llm | parser
-    
-    answer = qa_chain.invoke({
-        "question": request.question,
-        "content": doc.content
-    })
+    try:
+        with attribute_usage("qa", current_user.id, document_id):
+            answer = await run_chain(http_request, deadline, chains.get("qa"), {
+                "question": request.question,
+                "content": doc.prompt_text
+            })
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except DeadlineExceeded as e:
+        if not e.partial.strip():
+            raise HTTPException(status_code=504, detail=f"The answer did not arrive within {deadline.budget:g} seconds.")
+        return DocumentQAResponse(question=request.question, answer=e.partial, document_id=document_id, status="partial")
+    qa_cache.store(cache_key, request.question, answer, qa_version)
     
     return DocumentQAResponse(
         question=request.question,
@@ -346,45 +693,85 @@ async def query_document(
         document_id=document_id
     )
 
-@app.post("/negotiate-clause", response_model=NegotiateResponse, tags=["Analysis"])
-async def negotiate_clause(
+@router.post("/compare", response_model=CompareResponse, tags=["Analysis"])
+def compare_document_versions(
+    request: CompareRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Aligns the clauses of two of the user's documents (e.g. our draft and the counterparty's redline).
+    Stored risk results are reused; only added or changed clauses neither analysis covered go to the AI.
+    """
+    docs = {
+        doc.id: doc for doc in db.query(Document).filter(
+            Document.id.in_([request.base_document_id, request.other_document_id]),
+            Document.owner_id == current_user.id
+        )
+    }
+    base, other = docs.get(request.base_document_id), docs.get(request.other_document_id)
+    if not base or not other:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    base_analysis, other_analysis = latest_analysis(db, base.id), latest_analysis(db, other.id)
+    try:
+        with attribute_usage("compare", current_user.id, other.id):
+            result = compare_documents(
+                get_chains(), base.prompt_text, base_analysis, other.prompt_text, other_analysis, request.include_unchanged
+            )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Comparison error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compare documents.")
+    print(f"🔀 Compared documents {base.id} and {other.id}: {result['counts']}, {result['clauses_sent_to_llm']} clauses sent to the AI")
+
+    return CompareResponse(
+        base_document_id=base.id,
+        other_document_id=other.id,
+        base_analysis_id=base_analysis.id if base_analysis else None,
+        other_analysis_id=other_analysis.id if other_analysis else None,
+        **result
+    )
+
+@router.get("/cache/qa/stats", tags=["Admin"])
+async def get_qa_cache_stats(admin: User = Depends(require_admin)):
+    """
+    Reports hit rate and the best-match similarity distribution of the semantic Q&A cache
+    in the worker that serves the request.
+    """
+    return qa_cache.stats()
+
+@router.post("/negotiate-clause", response_model=NegotiateResponse, tags=["Analysis"])
+def negotiate_clause(
     request: NegotiateRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Generates fairer, alternative wording for a high-risk legal clause.
+    Suggestions precomputed for one of the user's analyses are served from storage.
     """
-    if not llm:
-        raise HTTPException(status_code=503, detail="AI service is unavailable.")
-
-    negotiate_prompt = PromptTemplate.from_template(
-        """
-        You are an AI assistant skilled in legal contract negotiation.
-        Your user has identified a clause with a '{risk_level}' risk level.
-        Your task is to rewrite this clause to be more fair and balanced, while preserving the original intent where possible.
+    stored = find_suggestions(db, current_user.id, request.clause_text, request.document_id)
+    if stored:
+        with attribute_usage("negotiate", current_user.id, request.document_id):
+            record_cache_hit("negotiate")
+        return NegotiateResponse(original_clause=request.clause_text, suggestions=stored, cached=True)
 
-        Original Clause:
-        "{clause_text}"
+    chains = get_chains()
+    if not chains:
+        raise HTTPException(status_code=503, detail="AI service is unavailable.")
 
-        Generate 2-3 distinct, alternative versions of this clause that are more favorable to the user.
-        Each suggestion should be a complete, professionally worded clause.
-        
-        Return ONLY a JSON object with a single key "suggestions" which is a list of the suggested clause strings.
-        Example: {{"suggestions": ["First suggested clause...", "Second suggested clause..."]}}
-        """
-    )
-    
-    parser = StrOutputParser()
-    negotiate_chain = negotiate_prompt | llm | parser
-    
     try:
-        response_str = negotiate_chain.invoke({
-            "risk_level": request.risk_level,
-            "clause_text": request.clause_text
-        })
-        # Clean and parse the JSON output from the LLM
-        response_json = json.loads(response_str.strip().replace("```json", "").replace("```", ""))
+        with attribute_usage("negotiate", current_user.id, request.document_id):
+            response_str = chains.get("negotiate").invoke({
+                "risk_level": request.risk_level,
+                "clause_text": request.clause_text
+            })
+        response_json = parse_json(response_str)
         suggestions = response_json.get("suggestions", ["Could not generate suggestions."])
+        if request.document_id is not None and "suggestions" in response_json:
+            store_single_suggestion(db, current_user.id, request, suggestions, chains.version("negotiate"))
         
         return NegotiateResponse(
             original_clause=request.clause_text,
@@ -394,7 +781,57 @@ async def negotiate_clause(
         print(f"Negotiation Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate negotiation suggestions.")
 
-@app.delete("/documents/{document_id}", status_code=status.HTTP_200_OK, tags=["Documents"])
+def _negotiations_response(document_id: int, analysis: Analysis, suggestions: dict) -> DocumentNegotiationsResponse:
+    return DocumentNegotiationsResponse(
+        document_id=document_id,
+        analysis_id=analysis.id,
+        negotiations=[
+            ClauseNegotiation(clause_index=index, clause=text, risk=risk, suggestions=suggestions[index])
+            for index, text, risk in analysis_clauses(analysis)
+            if index in suggestions
+        ]
+    )
+
+@router.get("/documents/{document_id}/negotiations", response_model=DocumentNegotiationsResponse, tags=["Analysis"])
+async def get_document_negotiations(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Returns the stored negotiation suggestions for the flagged clauses of a document's latest analysis.
+    """
+    doc = db.query(Document).filter(Document.id == document_id, Document.owner_id == current_user.id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    analysis = latest_analysis(db, document_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not available yet")
+    return _negotiations_response(document_id, analysis, stored_suggestions(db, analysis.id))
+
+@router.post("/documents/{document_id}/negotiations", response_model=DocumentNegotiationsResponse, tags=["Analysis"])
+def negotiate_document_clauses(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Rewrites every flagged clause that has no stored suggestions yet, in batched LLM calls.
+    """
+    doc = db.query(Document).filter(Document.id == document_id, Document.owner_id == current_user.id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    analysis = latest_analysis(db, document_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not available yet")
+    chains = get_chains()
+    if not chains:
+        raise HTTPException(status_code=503, detail="AI service is unavailable.")
+    with attribute_usage("negotiations", current_user.id, document_id):
+        suggestions = precompute_negotiations(db, analysis, chains)
+    return _negotiations_response(document_id, analysis, suggestions)
+
+@router.delete("/documents/{document_id}", status_code=status.HTTP_200_OK, tags=["Documents"])
 async def delete_document(
     document_id: int,
     current_user: User = Depends(get_current_user),
@@ -408,17 +845,22 @@ async def delete_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Delete associated analyses first to maintain data integrity
+    # Delete associated analyses (and their stored suggestions) first to maintain data integrity
+    analysis_ids = db.query(Analysis.id).filter(Analysis.document_id == document_id)
+    db.query(ClauseSuggestion).filter(ClauseSuggestion.analysis_id.in_(analysis_ids)).delete(synchronize_session=False)
     db.query(Analysis).filter(Analysis.document_id == document_id).delete()
+    remove_document(db, document_id)
+    analysis_queue.cancel(document_id)
     
     # Now delete the document itself
     db.delete(doc)
     db.commit()
+    qa_cache.invalidate(document_id)
     
     return {"message": "Document and its analyses deleted successfully"}
 
-@app.get("/documents/{document_id}/suggestions", response_model=SuggestionResponse, tags=["Analysis"])
-async def get_suggestions_for_document(
+@router.get("/documents/{document_id}/suggestions", response_model=SuggestionResponse, tags=["Analysis"])
+def get_suggestions_for_document(
     document_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -430,29 +872,12 @@ async def get_suggestions_for_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    suggestion_prompt = PromptTemplate.from_template(
-        """
-        You are an AI assistant analyzing a legal document. Your task is to generate insightful questions a user might have.
-        Based on the following document content, generate two lists of questions:
-        1.  `qa_suggestions`: Three questions that can be answered directly from the text (e.g., "What is the termination notice period?").
-        2.  `scenario_suggestions`: Three hypothetical "what-if" questions (e.g., "What happens if a payment is missed?").
-
-        Document Content (first 2000 characters):
-        "{content}"
-
-        Return ONLY a valid JSON object with two keys: "qa_suggestions" and "scenario_suggestions".
-        Example: {{"qa_suggestions": ["...", "..."], "scenario_suggestions": ["...", "..."]}}
-        """
-    )
-    
-    parser = StrOutputParser()
-    suggestion_chain = suggestion_prompt | llm | parser
-    
     try:
         # Limit content to keep the prompt efficient
-        content_snippet = doc.content[:2000]
-        response_str = suggestion_chain.invoke({"content": content_snippet})
-        response_json = json.loads(response_str.strip().replace("```json", "").replace("```", ""))
+        content_snippet = doc.prompt_text[:2000]
+        with attribute_usage("suggestions", current_user.id, document_id):
+            response_str = get_chains().get("suggestions").invoke({"content": content_snippet})
+        response_json = parse_json(response_str)
         
         return SuggestionResponse(
             qa_suggestions=response_json.get("qa_suggestions", []),
@@ -463,13 +888,42 @@ async def get_suggestions_for_document(
         raise HTTPException(status_code=500, detail="Failed to generate suggestions.")
 
 
-@app.get("/documents/{document_id}", response_model=DocumentDetail, tags=["Documents"])
-async def get_document(document_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    doc = db.query(Document).filter(Document.id == document_id, Document.owner_id == current_user.id).first()
-    if not doc:
+@router.get("/documents/{document_id}", response_model=DocumentDetail, tags=["Documents"])
+async def get_document(
+    document_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Validators come from ids and timestamps only, so a 304 never loads the document text
+    meta = (
+        db.query(Document.uploaded_at, Document.last_viewed_at)
+        .filter(Document.id == document_id, Document.owner_id == current_user.id)
+        .first()
+    )
+    if not meta:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    analysis_obj = db.query(Analysis).filter(Analysis.document_id == document_id).order_by(Analysis.created_at.desc()).first()
+
+    now = datetime.utcnow()
+    if meta.last_viewed_at is None or now - meta.last_viewed_at > LAST_VIEWED_RESOLUTION:
+        db.query(Document).filter(Document.id == document_id).update({Document.last_viewed_at: now}, synchronize_session=False)
+        db.commit()
+
+    latest = displayed_analysis(db, document_id, Analysis.id, Analysis.updated_at, Analysis.created_at)
+    revision = (latest.id, latest.updated_at or latest.created_at) if latest else None
+    etag, last_modified = document_validators(document_id, revision, meta.uploaded_at)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+    doc = db.query(Document).filter(Document.id == document_id).first()
+    analysis_obj = db.query(Analysis).filter(Analysis.id == latest.id).first() if latest else None
     
     analysis_data = None
     if analysis_obj:
@@ -477,12 +931,103 @@ async def get_document(document_id: int, current_user: User = Depends(get_curren
             "overall_risk_score": analysis_obj.overall_risk_score,
             "high_risk_clauses": json.loads(analysis_obj.high_risk_clauses),
             "simplified_summary": analysis_obj.simplified_summary,
-            "processing_time": analysis_obj.processing_time
+            "processing_time": analysis_obj.processing_time,
+            "prompt_version": analysis_obj.prompt_version,
+            "model_name": analysis_obj.model_name,
+            "status": analysis_obj.status or ANALYSIS_COMPLETE,
+            "inherited_from_id": analysis_obj.inherited_from_id,
+            "models_used": json.loads(analysis_obj.models_used) if analysis_obj.models_used else None
         }
     
     doc.analysis = analysis_data
     return doc
 
+@router.get("/reanalysis/status", response_model=ReanalysisStatus, tags=["Admin"])
+async def get_reanalysis_status(admin: User = Depends(require_admin)):
+    return reanalysis_scheduler.status()
+
+@router.post("/reanalysis/start", response_model=ReanalysisStatus, tags=["Admin"])
+async def start_reanalysis(admin: User = Depends(require_admin)):
+    if not llm_available():
+        raise HTTPException(status_code=503, detail="AI service is not available.")
+    reanalysis_scheduler.start()
+    return reanalysis_scheduler.status()
+
+@router.post("/reanalysis/stop", response_model=ReanalysisStatus, tags=["Admin"])
+async def stop_reanalysis(admin: User = Depends(require_admin)):
+    reanalysis_scheduler.stop()
+    return reanalysis_scheduler.status()
+
+@router.get("/models/routing", response_model=ModelRoutingStats, tags=["Admin"])
+async def get_model_routing(admin: User = Depends(require_admin)):
+    """Configured tiers and routes, plus per task and tier counts of served, failed and fallback calls."""
+    model_router = get_router()
+    if model_router is None:
+        raise HTTPException(status_code=503, detail="AI service is not available.")
+    return model_router.stats()
+
+@router.get("/user/analysis-queue", response_model=List[QueuedAnalysis], tags=["Documents"])
+async def get_analysis_queue(current_user: User = Depends(get_current_user)):
+    """
+    The user's queued and running analyses. Queued ones carry their position in the shared
+    fair-share order (1 = next to start), so a large batch shows how far along it is.
+    """
+    return analysis_queue.positions(current_user.id)
+
+@router.get("/analysis-queue/stats", response_model=AnalysisQueueStats, tags=["Admin"])
+async def get_analysis_queue_stats(admin: User = Depends(require_admin)):
+    return analysis_queue.stats()
+
+@router.get("/usage/rollup", response_model=UsageRollup, tags=["Admin"])
+async def get_usage_rollup(
+    group_by: Literal["user", "document", "chain", "model", "endpoint"] = "chain",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    admin: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    LLM calls, tokens, cost and latency across all users, grouped by user, document, chain, model or endpoint.
+    Most expensive first.
+    """
+    rows = usage_rollup(db, group_by, start, end, limit=min(max(limit, 1), 1000))
+    return UsageRollup(group_by=group_by, start=start, end=end, rows=rows, writer=usage_writer.stats())
+
+@router.get("/user/usage", response_model=UsageRollup, tags=["Documents"])
+async def get_user_usage(
+    group_by: Literal["document", "chain", "endpoint"] = "document",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    The user's own LLM usage and cost, per document, chain or endpoint.
+    """
+    rows = usage_rollup(db, group_by, start, end, user_id=current_user.id)
+    return UsageRollup(group_by=group_by, start=start, end=end, rows=rows)
+
+@router.get("/deadlines/stats", response_model=DeadlineStats, tags=["Admin"])
+async def get_deadline_stats(admin: User = Depends(require_admin)):
+    """Per-endpoint budgets and counts of completed, timed out, partial and client-abandoned LLM calls."""
+    return deadline_stats()
+
+# --- FastAPI App Initialization ---
+def create_app() -> FastAPI:
+    """Builds the API. Usable directly as `uvicorn --factory backend.main:create_app`."""
+    application = FastAPI(
+        title="LexiLens AI API",
+        description="Production-Grade Legal Document Intelligence Platform API",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    application.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+    application.include_router(router)
+    return application
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
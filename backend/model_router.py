@@ -0,0 +1,229 @@
+"""Per-task, size-aware model routing with fallback between tiers.
+
+Three tiers are configured by model name (LEXILENS_MODEL_TIERS):
+- "fast" serves suggestion questions and short inputs to the document tasks.
+- "standard" is the default.
+- "large" takes long documents for the document tasks.
+
+Only the document tasks move between tiers by input size, and a route set in
+LEXILENS_MODEL_ROUTES always wins over the size rules.
+
+If a call fails or times out before producing output, it falls back to the
+next tier. Cancelling an async call (see deadlines.py) is not a failure and
+never falls back. The tier and model that served each call are counted, and they
+are also reported to whatever `track_models()` block is active, so an
+analysis can store which models produced it.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .config import load_env
+from .text_cleaning import estimate_tokens
+
+load_env()
+
+TIERS = ("fast", "standard", "large")
+DEFAULT_TIER_MODELS = {
+    "fast": "gemini-1.5-flash-8b",
+    "standard": os.getenv("LEXILENS_GEMINI_MODEL", "gemini-1.5-flash"),
+    "large": "gemini-1.5-pro",
+}
+DEFAULT_ROUTES = {
+    "suggestions": "fast",
+    "negotiate": "standard",
+    "negotiate_batch": "standard",
+    "qa": "standard",
+    "scenario": "standard",
+    "risk": "standard",
+    "simplify": "standard",
+}
+# Tasks that read whole documents; they use the fast tier for short inputs and the large tier for long ones
+DOCUMENT_TASKS = {"risk", "simplify", "qa", "scenario"}
+# Fallback order after a tier fails: prefer a bigger model, then a smaller one
+FALLBACK_ORDER = {
+    "fast": ("standard", "large"),
+    "standard": ("large", "fast"),
+    "large": ("standard", "fast"),
+}
+
+FAST_MAX_TOKENS = int(os.getenv("LEXILENS_FAST_MAX_TOKENS", "1000"))
+LARGE_MIN_TOKENS = int(os.getenv("LEXILENS_LARGE_MIN_TOKENS", "50000"))
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("LEXILENS_MODEL_TIMEOUT_SECONDS", "120"))
+
+_served: ContextVar[Optional[Dict[str, str]]] = ContextVar("lexilens_served_models", default=None)
+
+
+def _parse_mapping(raw: str) -> Dict[str, str]:
+    """"a=x, b=y" -> {"a": "x", "b": "y"}."""
+    pairs = (item.split("=", 1) for item in raw.split(",") if "=" in item)
+    return {key.strip(): value.strip() for key, value in pairs if key.strip() and value.strip()}
+
+
+def tier_models() -> Dict[str, str]:
+    return {**DEFAULT_TIER_MODELS, **_parse_mapping(os.getenv("LEXILENS_MODEL_TIERS", ""))}
+
+
+def tier_timeout(tier: str) -> float:
+    return float(os.getenv(f"LEXILENS_MODEL_TIMEOUT_{tier.upper()}_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+
+
+def input_tokens(inputs: Dict[str, Any]) -> int:
+    return sum(estimate_tokens(value) for value in inputs.values() if isinstance(value, str))
+
+
+@contextmanager
+def track_models():
+    """Collects {task: model} for every routed call made inside the block (in this context)."""
+    used: Dict[str, str] = {}
+    token = _served.set(used)
+    try:
+        yield used
+    finally:
+        _served.reset(token)
+
+
+class ModelRouter:
+    """Picks a tier per task and input size, and keeps per-tier call statistics."""
+
+    def __init__(self, llms: Dict[str, Any], routes: Optional[Dict[str, str]] = None):
+        self.llms = llms
+        self.models = {tier: model_name_of(llm) for tier, llm in llms.items()}
+        self.configured = routes if routes is not None else _parse_mapping(os.getenv("LEXILENS_MODEL_ROUTES", ""))
+        self.routes = {**DEFAULT_ROUTES, **self.configured}
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    @property
+    def model_name(self) -> str:
+        """One model name when every tier uses it, else "fast=...,standard=...,large=..."."""
+        names = set(self.models.values())
+        if len(names) == 1:
+            return names.pop()
+        return ",".join(f"{tier}={self.models[tier]}" for tier in TIERS if tier in self.models)
+
+    def choose(self, task: str, tokens: int) -> str:
+        tier = self.routes.get(task, "standard")
+        if task in DOCUMENT_TASKS and task not in self.configured:
+            if tokens <= FAST_MAX_TOKENS:
+                tier = "fast"
+            elif tokens >= LARGE_MIN_TOKENS:
+                tier = "large"
+        return tier if tier in self.llms else "standard"
+
+    def plan(self, task: str, inputs: Dict[str, Any]) -> List[str]:
+        first = self.choose(task, input_tokens(inputs))
+        return [first] + [tier for tier in FALLBACK_ORDER.get(first, TIERS) if tier in self.llms and tier != first]
+
+    def record(self, task: str, tier: str, outcome: str):
+        with self._lock:
+            counts = self._stats.setdefault((task, tier), {"served": 0, "failed": 0, "fallback_served": 0})
+            counts[outcome] += 1
+        if outcome != "failed":
+            served = _served.get()
+            if served is not None:
+                served[task] = self.models[tier]
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = [
+                {"task": task, "tier": tier, "model": self.models[tier], **counts}
+                for (task, tier), counts in sorted(self._stats.items())
+            ]
+        return {
+            "tiers": self.models,
+            "routes": self.routes,
+            "fast_max_tokens": FAST_MAX_TOKENS,
+            "large_min_tokens": LARGE_MIN_TOKENS,
+            "calls": calls,
+        }
+
+
+class RoutedChain:
+    """A prompt compiled once per tier; each call runs on the routed tier and falls back on errors."""
+
+    def __init__(self, router: ModelRouter, task: str, chains: Dict[str, Any]):
+        self.router = router
+        self.task = task
+        self.chains = chains
+
+    def _failed(self, tier: str, error: Exception):
+        self.router.record(self.task, tier, "failed")
+        print(f"⚠️ {self.task} on {tier} tier ({self.router.models[tier]}) failed: {error}")
+
+    def invoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> Any:
+        error: Optional[Exception] = None
+        for attempt, tier in enumerate(self.router.plan(self.task, inputs)):
+            try:
+                result = self.chains[tier].invoke(inputs, config, **kwargs)
+            except KeyError:
+                raise  # missing prompt variables fail the same way on every tier
+            except Exception as e:
+                self._failed(tier, e)
+                error = e
+                continue
+            self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+            return result
+        raise error
+
+    def stream(self, inputs: Dict[str, Any], config=None, **kwargs) -> Iterator[Any]:
+        """Streams from the routed tier; falls back only if a tier fails before its first chunk."""
+        error: Optional[Exception] = None
+        for attempt, tier in enumerate(self.router.plan(self.task, inputs)):
+            started = False
+            try:
+                for chunk in self.chains[tier].stream(inputs, config, **kwargs):
+                    if not started:
+                        started = True
+                        self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+                    yield chunk
+                if not started:
+                    self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+                return
+            except Exception as e:
+                if started or isinstance(e, KeyError):
+                    raise
+                self._failed(tier, e)
+                error = e
+        raise error
+
+    async def ainvoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> Any:
+        error: Optional[Exception] = None
+        for attempt, tier in enumerate(self.router.plan(self.task, inputs)):
+            try:
+                result = await self.chains[tier].ainvoke(inputs, config, **kwargs)
+            except KeyError:
+                raise
+            except Exception as e:
+                self._failed(tier, e)
+                error = e
+                continue
+            self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+            return result
+        raise error
+
+    async def astream(self, inputs: Dict[str, Any], config=None, **kwargs) -> AsyncIterator[Any]:
+        error: Optional[Exception] = None
+        for attempt, tier in enumerate(self.router.plan(self.task, inputs)):
+            started = False
+            try:
+                async for chunk in self.chains[tier].astream(inputs, config, **kwargs):
+                    if not started:
+                        started = True
+                        self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+                    yield chunk
+                if not started:
+                    self.router.record(self.task, tier, "fallback_served" if attempt else "served")
+                return
+            except Exception as e:
+                if started or isinstance(e, KeyError):
+                    raise
+                self._failed(tier, e)
+                error = e
+        raise error
+
+
+def model_name_of(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
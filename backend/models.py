@@ -1,11 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Text, Float, DateTime, ForeignKey, Index, inspect, or_, text
 from sqlalchemy.orm import relationship
 import datetime
 from .database import Base, engine
 
-import os
-from dotenv import load_dotenv
-
 
 class User(Base):
     __tablename__ = "users"
@@ -20,12 +17,21 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String) 
     filename = Column(String)
-    content = Column(Text)
+    content = Column(Text)  # raw extracted text
+    clean_content = Column(Text, nullable=True)  # boilerplate stripped, see text_cleaning.py
+    tokens_saved = Column(Integer, default=0)
     uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_viewed_at = Column(DateTime, nullable=True, index=True)  # re-analysis priority, see reanalysis.py
+    minhash = Column(Text, nullable=True)  # hex MinHash signature, see near_duplicates.py
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="documents")
     analyses = relationship("Analysis", back_populates="document")
 
+    @property
+    def prompt_text(self) -> str:
+        """Text sent to the LLM: the cleaned copy when available, else the raw extraction."""
+        return self.clean_content or self.content
+
 class Analysis(Base):
     __tablename__ = "analyses"
     id = Column(Integer, primary_key=True, index=True)
@@ -35,12 +41,102 @@ class Analysis(Base):
     high_risk_clauses = Column(Text)  # JSON string
     simplified_summary = Column(Text)
     processing_time = Column(Float)
+    prompt_version = Column(String, nullable=True)  # e.g. "risk:1,simplify:1", see chains.PROMPTS
+    model_name = Column(String, nullable=True)
+    models_used = Column(Text, nullable=True)  # JSON {task: model} of the models that actually served each chain
+    # "running" while clauses are still being persisted from the stream, then "complete", "partial"
+    # (the risk model never reached some candidate clauses) or "failed";
+    # NULL on rows written before the column existed, which are complete
+    status = Column(String, nullable=True, index=True)
+    # Analysis of a near-duplicate document whose unchanged clauses and summary this one reused
+    inherited_from_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    clause_suggestions = relationship("ClauseSuggestion", back_populates="analysis")
+
+class ClauseSuggestion(Base):
+    __tablename__ = "clause_suggestions"
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey("analyses.id"), index=True)
+    analysis = relationship("Analysis", back_populates="clause_suggestions")
+    clause_index = Column(Integer)  # position in the analysis' high_risk_clauses list
+    clause_hash = Column(String, index=True)  # see negotiation.clause_hash
+    risk_level = Column(String)
+    suggestions = Column(Text)  # JSON list of alternative clause strings
+    prompt_version = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+class DocumentBand(Base):
+    """One LSH band bucket of a document's MinHash signature."""
+    __tablename__ = "document_bands"
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    bucket = Column(String)  # "<band>:<hash of the band's rows>"
+    __table_args__ = (Index("ix_document_bands_owner_bucket", "owner_id", "bucket"),)
+
+class LLMCall(Base):
+    """One model invocation (or a cache hit that saved one), written in batches by usage.py."""
+    __tablename__ = "llm_calls"
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    endpoint = Column(String, nullable=True)  # e.g. "qa", "analysis"; see usage.attribute
+    chain = Column(String, index=True)  # prompt name in chains.PROMPTS
+    model = Column(String, nullable=True)  # NULL for cache hits
+    tier = Column(String, nullable=True)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    latency_ms = Column(Float, default=0.0)
+    cost_usd = Column(Float, default=0.0)
+    cached = Column(Boolean, default=False)
+    status = Column(String, default="ok")  # "ok", "error" or "cancelled"
+    # Plain ids so the accounting outlives deleted documents
+    user_id = Column(Integer, nullable=True, index=True)
+    document_id = Column(Integer, nullable=True, index=True)
+
+ANALYSIS_RUNNING = "running"
+ANALYSIS_COMPLETE = "complete"
+ANALYSIS_PARTIAL = "partial"
+ANALYSIS_FAILED = "failed"
+
+def analysis_is_finished():
+    """SQL filter for analyses that can be shown: complete, or partial with some clauses never assessed."""
+    return or_(Analysis.status.in_([ANALYSIS_COMPLETE, ANALYSIS_PARTIAL]), Analysis.status.is_(None))
+
+def analysis_not_failed():
+    return or_(Analysis.status != ANALYSIS_FAILED, Analysis.status.is_(None))
+
+def add_missing_columns() -> list:
+    """Adds columns introduced after a table was first created; create_all never alters existing tables.
+
+    Idempotent: only columns the database does not have yet are added, as nullable, and their
+    indexes are created if missing. Rows that predate a column read it as NULL, which every
+    such column is written to handle. Returns the added "table.column" names.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in present]
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+            if missing:
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+    return added
+
 # Function to create all tables
 def create_tables():
     try:
         Base.metadata.create_all(bind=engine) # Use the imported engine
+        for column in add_missing_columns():
+            print(f"🛠️ Added column {column} to an existing table")
         print("✅ Database tables created successfully")
         return True
     except Exception as e:
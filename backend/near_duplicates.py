@@ -0,0 +1,151 @@
+"""Near-duplicate detection for uploads with MinHash signatures and LSH banding.
+
+Contracts built from the same template differ only in party names, dates and
+amounts, which defeats exact hashing. Each document gets a MinHash signature
+over word shingles of its normalized text, using one-permutation hashing:
+every shingle is hashed once and binned, so signing stays linear in document
+length without numpy. The signature is split into LSH bands, and one
+DocumentBand row is stored per band. A lookup is then a single indexed query
+for documents sharing a band with the upload, followed by an exact signature
+comparison of the best few candidates.
+
+Backfill signatures for documents uploaded before this existed with
+`python -m backend.near_duplicates --backfill`.
+"""
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import Document, DocumentBand
+
+ENABLED = os.getenv("LEXILENS_NEAR_DUP_ENABLED", "1") == "1"
+# Estimated Jaccard similarity of shingle sets; banding below finds pairs above ~0.7 reliably
+THRESHOLD = float(os.getenv("LEXILENS_NEAR_DUP_THRESHOLD", "0.8"))
+NUM_HASHES = 128
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_WORDS = 5
+MAX_CANDIDATES = 50
+MAX_BUCKET_HITS = 2000
+
+WORD = re.compile(r"[a-z]+|\d+")
+_MASK = (1 << 64) - 1
+_DENSIFY_OFFSET = 0x9E3779B97F4A7C15
+
+
+def _shingle_hashes(text: str):
+    # Numbers are collapsed so changed dates and amounts only affect the shingles around them
+    words = ["0" if w[0].isdigit() else w for w in WORD.findall(text.lower())]
+    for i in range(len(words) - SHINGLE_WORDS + 1):
+        shingle = " ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")
+        yield int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+
+
+def signature(text: str) -> Optional[List[int]]:
+    """One-permutation MinHash signature, or None if the text is too short to shingle."""
+    bins: List[Optional[int]] = [None] * NUM_HASHES
+    for h in _shingle_hashes(text):
+        slot, value = h % NUM_HASHES, h // NUM_HASHES
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    filled = [i for i, value in enumerate(bins) if value is not None]
+    if not filled:
+        return None
+    # Rotation densification: an empty bin borrows the next filled bin's value, offset by the distance
+    for i, value in enumerate(bins):
+        if value is None:
+            distance = next((d for d in range(1, NUM_HASHES) if bins[(i + d) % NUM_HASHES] is not None))
+            bins[i] = (bins[(i + distance) % NUM_HASHES] + distance * _DENSIFY_OFFSET) & _MASK
+    return bins
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two documents' shingle sets."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+
+def encode(sig: List[int]) -> str:
+    return "".join(f"{value:016x}" for value in sig)
+
+
+def decode(raw: str) -> List[int]:
+    return [int(raw[i:i + 16], 16) for i in range(0, len(raw), 16)]
+
+
+def band_keys(sig: List[int]) -> List[str]:
+    keys = []
+    for band in range(BANDS):
+        rows = ",".join(str(value) for value in sig[band * ROWS:(band + 1) * ROWS]).encode("utf-8")
+        keys.append(f"{band:02d}:{hashlib.blake2b(rows, digest_size=8).hexdigest()}")
+    return keys
+
+
+def index_document(db: Session, doc: Document, text: str) -> Optional[List[int]]:
+    """Stores the document's signature and LSH band rows (the caller commits)."""
+    sig = signature(text)
+    if sig is None:
+        return None
+    doc.minhash = encode(sig)
+    db.query(DocumentBand).filter(DocumentBand.document_id == doc.id).delete(synchronize_session=False)
+    db.add_all(DocumentBand(document_id=doc.id, owner_id=doc.owner_id, bucket=key) for key in band_keys(sig))
+    return sig
+
+
+def find_near_duplicates(db: Session, owner_id: int, sig: Optional[List[int]], exclude_id: Optional[int] = None,
+                         threshold: float = THRESHOLD) -> List[Tuple[int, float]]:
+    """(document_id, similarity) of the owner's documents at or above `threshold`, most similar first."""
+    if sig is None:
+        return []
+    query = db.query(DocumentBand.document_id).filter(
+        DocumentBand.owner_id == owner_id, DocumentBand.bucket.in_(band_keys(sig))
+    )
+    if exclude_id is not None:
+        query = query.filter(DocumentBand.document_id != exclude_id)
+    # A popular template can share buckets with thousands of documents; a bounded sample of
+    # bucket hits is enough to rank candidates by how many bands they share. Newest documents
+    # first makes the sample deterministic and favours the latest revision of a template.
+    shared = Counter(doc_id for (doc_id,) in query.order_by(DocumentBand.document_id.desc()).limit(MAX_BUCKET_HITS))
+    candidate_ids = [doc_id for doc_id, _ in shared.most_common(MAX_CANDIDATES)]
+    if not candidate_ids:
+        return []
+    rows = db.query(Document.id, Document.minhash).filter(Document.id.in_(candidate_ids), Document.minhash.isnot(None))
+    scored = [(doc_id, similarity(sig, decode(raw))) for doc_id, raw in rows]
+    return sorted(((doc_id, score) for doc_id, score in scored if score >= threshold), key=lambda item: -item[1])
+
+
+def remove_document(db: Session, document_id: int):
+    db.query(DocumentBand).filter(DocumentBand.document_id == document_id).delete(synchronize_session=False)
+
+
+def backfill(db: Session, batch_size: int = 200) -> int:
+    """Signs and indexes every document that has no signature yet."""
+    indexed = 0
+    while True:
+        docs = db.query(Document).filter(Document.minhash.is_(None)).order_by(Document.id).limit(batch_size).all()
+        if not docs:
+            return indexed
+        for doc in docs:
+            if index_document(db, doc, doc.prompt_text or "") is None:
+                doc.minhash = ""  # too short to sign; don't pick it up again
+            indexed += 1
+        db.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Near-duplicate index maintenance")
+    parser.add_argument("--backfill", action="store_true", help="sign and index documents without a signature")
+    args = parser.parse_args()
+    if args.backfill:
+        session = SessionLocal()
+        try:
+            print(f"✅ Indexed {backfill(session)} documents")
+        finally:
+            session.close()
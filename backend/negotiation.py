@@ -0,0 +1,113 @@
+"""Batched negotiation suggestions, precomputed per analysis and served from storage.
+
+Instead of one /negotiate-clause LLM call per click, all risky clauses of an
+analysis are rewritten in a few batched prompts and stored as
+ClauseSuggestion rows keyed by analysis, clause position and clause hash.
+Clauses a batch response leaves out (malformed or truncated output) are sent
+again once in a follow-up batch, rather than re-running the whole batch.
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .json_stream import parse_json
+from .models import Analysis, ClauseSuggestion, Document
+
+BATCH_SIZE = int(os.getenv("LEXILENS_NEGOTIATION_BATCH_SIZE", "8"))
+PRECOMPUTE = os.getenv("LEXILENS_PRECOMPUTE_NEGOTIATIONS", "0") == "1"
+RISK_LEVELS = {level.strip().lower() for level in os.getenv("LEXILENS_NEGOTIATION_RISK_LEVELS", "High").split(",")}
+
+
+def clause_hash(clause_text: str) -> str:
+    return hashlib.sha256(re.sub(r"\s+", " ", clause_text).strip().lower().encode("utf-8")).hexdigest()
+
+
+def format_for_prompt(batch: List[Tuple[int, str, str]]) -> str:
+    return "\n".join(f"[{index}] ({risk}) {text}" for index, text, risk in batch)
+
+
+def negotiate_batch(chains, batch: List[Tuple[int, str, str]]) -> Dict[int, List[str]]:
+    """Rewrites (index, clause_text, risk_level) clauses in one LLM call; returns suggestions by index."""
+    response = parse_json(chains.get("negotiate_batch").invoke({"clauses": format_for_prompt(batch)}))
+    requested = {index for index, _, _ in batch}
+    results: Dict[int, List[str]] = {}
+    for entry in response.get("negotiations", []) if isinstance(response, dict) else []:
+        if not isinstance(entry, dict):
+            continue
+        suggestions = [s for s in entry.get("suggestions") or [] if isinstance(s, str) and s.strip()]
+        try:
+            index = int(entry.get("clause_number"))
+        except (TypeError, ValueError):
+            continue
+        if index in requested and suggestions:
+            results[index] = suggestions
+    return results
+
+
+def analysis_clauses(analysis: Analysis) -> List[Tuple[int, str, str]]:
+    """(index, clause_text, risk_level) for every clause listed in an analysis."""
+    clauses = json.loads(analysis.high_risk_clauses or "[]")
+    return [
+        (index, clause.get("clause", ""), clause.get("risk", "High"))
+        for index, clause in enumerate(clauses)
+        if clause.get("clause")
+    ]
+
+
+def flagged_clauses(analysis: Analysis) -> List[Tuple[int, str, str]]:
+    """Clauses whose risk level qualifies for batch negotiation (LEXILENS_NEGOTIATION_RISK_LEVELS)."""
+    return [clause for clause in analysis_clauses(analysis) if str(clause[2]).lower() in RISK_LEVELS]
+
+
+def stored_suggestions(db: Session, analysis_id: int) -> Dict[int, List[str]]:
+    rows = db.query(ClauseSuggestion).filter(ClauseSuggestion.analysis_id == analysis_id).all()
+    return {row.clause_index: json.loads(row.suggestions) for row in rows}
+
+
+def precompute_negotiations(db: Session, analysis: Analysis, chains) -> Dict[int, List[str]]:
+    """Fills in suggestions for every flagged clause of `analysis` that has none yet, in batches."""
+    existing = stored_suggestions(db, analysis.id)
+    pending = [clause for clause in flagged_clauses(analysis) if clause[0] not in existing]
+    version = chains.version("negotiate_batch")
+    retried = set()
+    while pending:
+        batch, pending = pending[:BATCH_SIZE], pending[BATCH_SIZE:]
+        try:
+            results = negotiate_batch(chains, batch)
+        except Exception as e:
+            print(f"❌ Negotiation batch for analysis ID {analysis.id} failed: {e}")
+            results = {}
+        missing = [clause for clause in batch if clause[0] not in results and clause[0] not in retried]
+        retried.update(index for index, _, _ in missing)
+        pending.extend(missing)
+        for index, text, risk in batch:
+            if index in results:
+                db.add(ClauseSuggestion(
+                    analysis_id=analysis.id,
+                    clause_index=index,
+                    clause_hash=clause_hash(text),
+                    risk_level=risk,
+                    suggestions=json.dumps(results[index]),
+                    prompt_version=version
+                ))
+                existing[index] = results[index]
+        db.commit()
+    return existing
+
+
+def find_suggestions(db: Session, owner_id: int, clause_text: str, document_id: Optional[int] = None) -> Optional[List[str]]:
+    """Looks up stored suggestions for a clause among the owner's analyses, newest first."""
+    query = (
+        db.query(ClauseSuggestion)
+        .join(Analysis, ClauseSuggestion.analysis_id == Analysis.id)
+        .join(Document, Analysis.document_id == Document.id)
+        .filter(Document.owner_id == owner_id, ClauseSuggestion.clause_hash == clause_hash(clause_text))
+    )
+    if document_id is not None:
+        query = query.filter(Document.id == document_id)
+    row = query.order_by(ClauseSuggestion.created_at.desc()).first()
+    return json.loads(row.suggestions) if row else None
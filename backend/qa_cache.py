@@ -0,0 +1,189 @@
+"""Per-document semantic cache for Q&A answers.
+
+Questions are embedded locally (hashed bag of stemmed words plus character
+n-grams, no model download) and an earlier answer on the same document is
+reused when the cosine similarity clears a configurable threshold and both
+questions carry the same negations and the same numbers, amounts and dates.
+Those are the words that flip an answer while barely moving the similarity
+("liable" vs "not liable", "30 days" vs "90 days").
+
+The cache lives in process memory, so each API worker keeps its own and an
+invalidation only reaches the worker that made it. Entries are therefore keyed
+by owner, document id, upload time and the analysis the answer was given
+under (see `document_key`): a re-analysis done in another worker, or a
+document id the database hands out again after a delete, starts from an empty
+key instead of hitting a stale answer.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+EMBEDDING_DIM = 1024
+DEFAULT_THRESHOLD = float(os.getenv("LEXILENS_QA_CACHE_THRESHOLD", "0.8"))
+MAX_ENTRIES_PER_DOCUMENT = int(os.getenv("LEXILENS_QA_CACHE_MAX_ENTRIES", "200"))
+MAX_DOCUMENTS = int(os.getenv("LEXILENS_QA_CACHE_MAX_DOCUMENTS", "5000"))
+HISTOGRAM_BUCKETS = 10
+
+# Party pronouns ("I", "we", "they") are kept on purpose: they change who an answer is about
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from how if in is it much of on or "
+    "should the there this to under what when where which whom why will with would "
+    "agreement contract document".split()
+)
+SUFFIXES = ("ations", "ation", "ions", "ion", "ing", "ed", "es", "ates", "ate", "s")
+WORD = re.compile(r"[a-z0-9]+")
+GUARD_WORD = re.compile(r"[a-z]+(?:'t)?|\d+(?:[.,]\d+)*%?")
+NEGATIONS = frozenset(
+    "not no never without none nothing nobody neither nor cannot can't won't don't doesn't didn't isn't "
+    "aren't wasn't weren't hasn't haven't hadn't shouldn't wouldn't couldn't mustn't needn't "
+    "cant wont dont doesnt didnt isnt arent wasnt werent hasnt havent hadnt shouldnt wouldnt couldnt".split()
+)
+QUANTITY_WORDS = frozenset(
+    "zero one two three four five six seven eight nine ten eleven twelve fifteen twenty thirty forty fifty "
+    "sixty ninety hundred thousand million billion half double twice first second third last "
+    "january february march april june july august september october november december".split()
+)
+
+
+class CacheEntry(NamedTuple):
+    question: str
+    answer: str
+    prompt_version: str
+    vector: Dict[int, float]
+    guard: Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def document_key(owner_id: int, document_id: int, uploaded_at: Optional[datetime], analysis_id: Optional[int]) -> tuple:
+    """Cache key of a document as one specific upload, answered under one specific analysis."""
+    return owner_id, document_id, uploaded_at.isoformat() if uploaded_at else None, analysis_id
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def _bucket(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(), "big") % EMBEDDING_DIM
+
+
+def embed(text: str) -> Dict[int, float]:
+    """Sparse, L2-normalized hashed embedding of a question."""
+    # Negations are left to guard_tokens, which compares them exactly
+    stems = [_stem(w) for w in WORD.findall(text.lower()) if w not in STOPWORDS and w not in NEGATIONS]
+    vector: Dict[int, float] = {}
+    for stem in stems:
+        vector[_bucket("w:" + stem)] = vector.get(_bucket("w:" + stem), 0.0) + 1.0
+        padded = f"^{stem}$"
+        for i in range(len(padded) - 3):
+            key = _bucket("c:" + padded[i:i + 4])
+            vector[key] = vector.get(key, 0.0) + 0.25
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def guard_tokens(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """What a question negates and the numbers, amounts and dates it names; a hit needs both to match exactly.
+
+    Each negation is recorded with the word it applies to, so "does not pay" and
+    "not liable" differ, while "cannot terminate" and "can not terminate" agree.
+    """
+    words = GUARD_WORD.findall(text.lower().replace("\u2019", "'"))
+    negated, quantities = [], []
+    for i, word in enumerate(words):
+        if word in NEGATIONS:
+            following = next((w for w in words[i + 1:] if w not in STOPWORDS and w not in NEGATIONS), "")
+            negated.append(_stem(following))
+        elif word[0].isdigit():
+            quantities.append(word.replace(",", "").rstrip("."))
+        elif word in QUANTITY_WORDS:
+            quantities.append(word)
+    return tuple(sorted(negated)), tuple(sorted(quantities))
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._entries: "OrderedDict[Hashable, List[CacheEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._histogram = [0] * HISTOGRAM_BUCKETS
+
+    def lookup(self, key: Hashable, question: str, prompt_version: str) -> Optional[Tuple[CacheEntry, float]]:
+        """Returns the closest compatible cached entry and its similarity if it clears the threshold."""
+        vector, guard = embed(question), guard_tokens(question)
+        best, best_score = None, 0.0
+        with self._lock:
+            for entry in self._entries.get(key, []):
+                if entry.prompt_version != prompt_version or entry.guard != guard:
+                    continue
+                score = cosine(vector, entry.vector)
+                if score > best_score:
+                    best, best_score = entry, score
+            self._histogram[min(int(best_score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)] += 1
+            if best is not None and best_score >= self.threshold:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return best, best_score
+            self.misses += 1
+        return None
+
+    def store(self, key: Hashable, question: str, answer: str, prompt_version: str):
+        entry = CacheEntry(question, answer, prompt_version, embed(question), guard_tokens(question))
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            entries.append(entry)
+            del entries[:-MAX_ENTRIES_PER_DOCUMENT]
+            self._entries.move_to_end(key)
+            while len(self._entries) > MAX_DOCUMENTS:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, document_id: int):
+        """Drops this worker's cached answers for a document (deleted or re-analyzed).
+
+        Only frees memory early: other workers' entries can no longer be hit because
+        their key names an older analysis or upload.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == document_id]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),  # the numbers cover this worker only
+                "threshold": self.threshold,
+                "lookups": lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "documents": len(self._entries),
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "similarity_histogram": {
+                    f"{i / HISTOGRAM_BUCKETS:.1f}-{(i + 1) / HISTOGRAM_BUCKETS:.1f}": count
+                    for i, count in enumerate(self._histogram)
+                },
+            }
+
+
+qa_cache = SemanticAnswerCache()
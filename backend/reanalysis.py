@@ -0,0 +1,151 @@
+"""Background re-analysis of documents whose latest analysis is out of date.
+
+An analysis is stale when its prompt_version or model_name differs from what
+the chain registry would produce today, or when it is partial (the risk model
+never reached some candidate clauses). Stale documents are re-run one at a
+time at a throttled rate, most recently viewed first. Staleness is read from
+the database on every pick, so a restarted scheduler resumes where the last
+one stopped. Each re-run appends a new Analysis row in its own transaction;
+readers keep seeing the previous row until it commits.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import ANALYSIS_PARTIAL, Analysis, Document, analysis_not_failed
+
+PER_MINUTE = float(os.getenv("LEXILENS_REANALYSIS_PER_MINUTE", "6"))
+MAX_ATTEMPTS = 3
+IDLE_SECONDS = 60
+
+
+def stale_document_ids(db: Session, prompt_version: str, model_name: str, limit: int = 50,
+                       exclude: Optional[List[int]] = None) -> List[int]:
+    """Documents whose latest analysis came from another prompt or model or is partial, recently viewed first."""
+    latest = (
+        db.query(Analysis.document_id, func.max(Analysis.id).label("analysis_id"))
+        .filter(analysis_not_failed())
+        .group_by(Analysis.document_id)
+        .subquery()
+    )
+    query = (
+        db.query(Document.id)
+        .join(latest, latest.c.document_id == Document.id)
+        .join(Analysis, Analysis.id == latest.c.analysis_id)
+        .filter(or_(
+            Analysis.status == ANALYSIS_PARTIAL,
+            Analysis.prompt_version.is_(None),
+            Analysis.prompt_version != prompt_version,
+            Analysis.model_name.is_(None),
+            Analysis.model_name != model_name,
+        ))
+    )
+    if exclude:
+        query = query.filter(Document.id.notin_(exclude))
+    query = query.order_by(Document.last_viewed_at.desc().nullslast(), Document.uploaded_at.desc())
+    return [doc_id for (doc_id,) in query.limit(limit).all()]
+
+
+class ReanalysisScheduler:
+    """Single background thread that re-runs stale analyses at most PER_MINUTE times a minute."""
+
+    def __init__(self, analyze: Callable[[int, Session], None], current_versions: Callable[[], Optional[tuple]]):
+        self._analyze = analyze
+        self._current_versions = current_versions
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._attempts: Dict[int, int] = {}
+        self.per_minute = PER_MINUTE
+        self.completed = 0
+        self.started_at: Optional[datetime] = None
+        self.last_document_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        if self.running:
+            return False
+        self._stop.clear()
+        self.started_at = datetime.utcnow()
+        self._thread = threading.Thread(target=self._run, name="lexilens-reanalysis", daemon=True)
+        self._thread.start()
+        print(f"🔁 Re-analysis scheduler started ({self.per_minute:g}/min)")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _given_up(self) -> List[int]:
+        return [doc_id for doc_id, attempts in self._attempts.items() if attempts >= MAX_ATTEMPTS]
+
+    def _next_document(self) -> Optional[int]:
+        versions = self._current_versions()
+        if versions is None:
+            return None
+        db = SessionLocal()
+        try:
+            ids = stale_document_ids(db, *versions, limit=1, exclude=self._given_up())
+            return ids[0] if ids else None
+        finally:
+            db.close()
+
+    def _run(self):
+        interval = 60.0 / self.per_minute if self.per_minute > 0 else 0.0
+        while not self._stop.is_set():
+            doc_id = self._next_document()
+            if doc_id is None:
+                self._stop.wait(IDLE_SECONDS)
+                continue
+            started = time.monotonic()
+            self._attempts[doc_id] = self._attempts.get(doc_id, 0) + 1
+            self.last_document_id = doc_id
+            self._analyze(doc_id, SessionLocal())
+            if self._is_current(doc_id):
+                self._attempts.pop(doc_id, None)
+                self.completed += 1
+            self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+        print("🔁 Re-analysis scheduler stopped")
+
+    def _is_current(self, doc_id: int) -> bool:
+        versions = self._current_versions()
+        db = SessionLocal()
+        try:
+            latest = (
+                db.query(Analysis.prompt_version, Analysis.model_name, Analysis.status)
+                .filter(Analysis.document_id == doc_id, analysis_not_failed())
+                .order_by(Analysis.id.desc())
+                .first()
+            )
+            return (latest is not None and latest.status != ANALYSIS_PARTIAL
+                    and (latest.prompt_version, latest.model_name) == tuple(versions or ()))
+        finally:
+            db.close()
+
+    def status(self) -> dict:
+        versions = self._current_versions()
+        pending = None
+        if versions:
+            db = SessionLocal()
+            try:
+                pending = len(stale_document_ids(db, *versions, limit=100000, exclude=self._given_up()))
+            finally:
+                db.close()
+        return {
+            "running": self.running,
+            "per_minute": self.per_minute,
+            "prompt_version": versions[0] if versions else None,
+            "model_name": versions[1] if versions else None,
+            "pending": pending,
+            "completed": self.completed,
+            "failed_document_ids": self._given_up(),
+            "last_document_id": self.last_document_id,
+            "started_at": self.started_at,
+        }
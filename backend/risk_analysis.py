@@ -0,0 +1,91 @@
+"""Streamed risk analysis with incremental clause delivery and partial retries.
+
+The risk chain is streamed and each flagged clause is handed to a callback as
+soon as its JSON object is complete, so callers can persist it right away.
+If the stream breaks off or the output is cut short, only the candidate
+clauses after the last one the model reached are sent again. Clauses already
+received are kept.
+"""
+import os
+from typing import Callable, Iterator, List, NamedTuple, Optional, Set
+
+from .clauses import Clause, attach_offsets, format_for_prompt
+from .json_stream import ArrayItemStream
+
+MAX_RETRIES = int(os.getenv("LEXILENS_RISK_MAX_RETRIES", "2"))
+
+
+class RiskResult(NamedTuple):
+    overall_risk_score: Optional[float]
+    clauses: List[dict]
+    attempts: int
+    complete: bool  # every candidate was covered by a fully received response
+
+
+def _accept(item: dict, clauses: List[Clause], seen: Set[str]) -> Optional[dict]:
+    if not isinstance(item.get("clause"), str) or not item["clause"].strip():
+        return None
+    clause = attach_offsets([item], clauses)[0]
+    key = clause.get("clause_id") or clause["clause"]
+    if key in seen:
+        return None
+    seen.add(key)
+    return clause
+
+
+def _uncovered(remaining: List[Clause], reached: Set[str]) -> List[Clause]:
+    """Candidates after the last clause the model got to; the risk prompt asks for answers in the order given."""
+    positions = [index for index, clause in enumerate(remaining) if clause.id in reached]
+    return remaining[max(positions) + 1:] if positions else remaining
+
+
+def _chunks(chain, inputs: dict, errors: List[Exception]) -> Iterator[str]:
+    """Streams the chain's output; a model or connection error ends the stream and is appended to `errors`.
+
+    Errors raised by the consumer (e.g. the `on_clause` callback) are not caught here.
+    """
+    try:
+        yield from chain.stream(inputs)
+    except Exception as e:
+        errors.append(e)
+
+
+def stream_risk(chains, candidates: List[Clause], clauses: List[Clause],
+                on_clause: Callable[[dict], None] = lambda clause: None) -> RiskResult:
+    """Runs the risk chain over `candidates`, calling `on_clause` for every flagged clause as it streams in."""
+    flagged: List[dict] = []
+    seen: Set[str] = set()
+    scores: List[float] = []
+    remaining = list(candidates)
+    attempts = 0
+    complete = not remaining
+    while remaining and attempts <= MAX_RETRIES:
+        attempts += 1
+        stream = ArrayItemStream("clauses")
+        reached: Set[str] = set()
+        errors: List[Exception] = []
+        for chunk in _chunks(chains.get("risk"), {"clauses": format_for_prompt(remaining)}, errors):
+            for item in stream.feed(chunk):
+                reached.add(str(item.get("clause_id", "")).strip("[] "))
+                clause = _accept(item, clauses, seen)
+                if clause:
+                    flagged.append(clause)
+                    on_clause(clause)
+        failed = bool(errors)
+        if failed:
+            print(f"⚠️ Risk stream attempt {attempts} broke off after {len(reached)} clauses: {errors[0]}")
+
+        score = stream.result().get("overall_risk_score")
+        if isinstance(score, (int, float)):
+            scores.append(float(score))
+        if stream.complete and not failed:
+            complete = True
+            break
+        remaining = _uncovered(remaining, reached)
+        if not remaining:
+            complete = True
+        elif attempts <= MAX_RETRIES:
+            print(f"🔁 Retrying risk analysis for the {len(remaining)} candidate clauses not yet covered")
+
+    # A partial response scored only part of the document, so keep the most severe score seen
+    return RiskResult(max(scores) if scores else None, flagged, attempts, complete)
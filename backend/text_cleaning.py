@@ -0,0 +1,136 @@
+"""Ingest-time normalization of extracted contract text.
+
+PDF extraction keeps every page's running header, footer, page number and
+confidentiality legend. They carry no meaning for the model but are sent with
+every analysis, Q&A and scenario prompt, so we strip them once at upload.
+"""
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# Lines within this many non-blank lines of a page edge are header/footer candidates
+EDGE_LINES = 3
+# A line must repeat on at least this share of pages (and at least MIN_PAGES pages)
+EDGE_REPEAT_RATIO = 0.5
+ANYWHERE_REPEAT_RATIO = 0.8
+# Mid-page repeats this short are usually wrapped sentence ends ("Agreement."), not legends
+ANYWHERE_MIN_WORDS = 5
+MIN_PAGES = 3
+MAX_BOILERPLATE_CHARS = 200
+
+CLAUSE_NUMBER = re.compile(r"^((#+\.)+#*|(section|article|clause)\s+#+)\s", re.IGNORECASE)
+PAGE_NUMBER = re.compile(r"^(page\s*)?[-–(\[]?\s*#+\s*[-–)\]]?(\s*(of|/)\s*#+)?$", re.IGNORECASE)
+HYPHENATED_BREAK = re.compile(r"(\w)-\n([a-z])")
+INLINE_SPACE = re.compile(r"[ \t ]+")
+BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+class NormalizedText(NamedTuple):
+    text: str
+    raw_tokens: int
+    clean_tokens: int
+    removed_lines: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.clean_tokens)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English prose, same heuristic Gemini docs use
+    return max(1, len(text) // 4)
+
+
+def _exact_key(line: str) -> str:
+    return INLINE_SPACE.sub(" ", line).strip().lower()
+
+
+def _line_key(line: str) -> str:
+    """Canonical form used to spot repeated headers: page numbers and dates differ page to page."""
+    return re.sub(r"\d+", "#", _exact_key(line))
+
+
+def _edge_slots(lines: List[str]) -> Dict[int, Tuple[int, ...]]:
+    """Line index -> its positions among the page's first and last EDGE_LINES non-blank lines.
+
+    Positions count 0, 1, ... from the top and -1, -2, ... from the bottom; a line on a
+    short page can hold one of each.
+    """
+    non_blank = [i for i, line in enumerate(lines) if line.strip()]
+    slots: Dict[int, Tuple[int, ...]] = {}
+    for offset, i in enumerate(non_blank[:EDGE_LINES]):
+        slots[i] = slots.get(i, ()) + (offset,)
+    for offset, i in enumerate(reversed(non_blank[-EDGE_LINES:])):
+        slots[i] = slots.get(i, ()) + (-(offset + 1),)
+    return slots
+
+
+def _is_candidate(key: str) -> bool:
+    # Numbered clauses are content even when their wording repeats across pages, and bare
+    # numbers are left to the page-edge check so list markers and amounts mid-page survive
+    return len(key) <= MAX_BOILERPLATE_CHARS and not CLAUSE_NUMBER.match(key) and not PAGE_NUMBER.match(key)
+
+
+def _boilerplate_keys(pages: List[List[str]]) -> Tuple[set, set]:
+    """(edge keys, anywhere keys).
+
+    Edge keys are (slot, line key) pairs: a running header sits at the same place on
+    every page, while body text that happens to fall near an edge moves around. They
+    compare lines with digits collapsed, so "Page 3 of 9" and dated headers match.
+    Anywhere keys are exact lines repeated on most pages, such as legends.
+    """
+    if len(pages) < MIN_PAGES:
+        return set(), set()
+    edge_counts, anywhere_counts = Counter(), Counter()
+    for lines in pages:
+        edge_counts.update({(slot, _line_key(lines[i])) for i, slots in _edge_slots(lines).items() for slot in slots})
+        anywhere_counts.update({_exact_key(line) for line in lines if line.strip()})
+
+    edge_min = max(MIN_PAGES, EDGE_REPEAT_RATIO * len(pages))
+    anywhere_min = max(MIN_PAGES, ANYWHERE_REPEAT_RATIO * len(pages))
+    edge_keys = {key for key, count in edge_counts.items() if count >= edge_min and _is_candidate(key[1])}
+    anywhere_keys = {
+        key for key, count in anywhere_counts.items()
+        if count >= anywhere_min and len(key.split()) >= ANYWHERE_MIN_WORDS and _is_candidate(_line_key(key))
+    }
+    return edge_keys, anywhere_keys
+
+
+def _is_boilerplate(line: str, keys: Tuple[set, set], slots: Tuple[int, ...], page_edge: bool) -> bool:
+    """`slots`: the line's positions in the page's edge window (see _edge_slots), empty mid-page.
+    `page_edge`: the line is the first or last non-blank line of a page in multi-page input.
+
+    A bare number or "(1)" anywhere else is usually a list marker or an amount, so
+    page numbers are only recognized at the edges.
+    """
+    edge_keys, anywhere_keys = keys
+    key = _line_key(line)
+    if not key or CLAUSE_NUMBER.match(key):
+        return False
+    if any((slot, key) in edge_keys for slot in slots):
+        return True
+    return _exact_key(line) in anywhere_keys or (page_edge and bool(PAGE_NUMBER.match(key)))
+
+
+def normalize_pages(pages: List[str]) -> NormalizedText:
+    """Drops repeated headers/footers and page numbers, then collapses whitespace and hyphenation."""
+    raw = "".join(pages)
+    split_pages = [page.splitlines() for page in pages]
+    boilerplate = _boilerplate_keys(split_pages)
+
+    multi_page = len(split_pages) >= MIN_PAGES
+    kept, removed = [], 0
+    for lines in split_pages:
+        slots = _edge_slots(lines)
+        edges = {i for i, line_slots in slots.items() if 0 in line_slots or -1 in line_slots} if multi_page else set()
+        for i, line in enumerate(lines):
+            if _is_boilerplate(line, boilerplate, slots.get(i, ()), i in edges):
+                removed += 1
+                continue
+            kept.append(INLINE_SPACE.sub(" ", line).strip())
+        kept.append("")
+
+    text = "\n".join(kept)
+    text = HYPHENATED_BREAK.sub(r"\1\2", text)
+    text = BLANK_RUNS.sub("\n\n", text).strip()
+    return NormalizedText(text, estimate_tokens(raw), estimate_tokens(text), removed)
@@ -0,0 +1,230 @@
+"""Per-call token, latency and cost accounting for LLM invocations.
+
+Every model call made through the chain registry is reported by a callback
+(chains.CallRecorder). Cache hits that saved a call are reported too. Each
+report becomes one LLMCall row, with the endpoint, user and document set by
+the innermost `attribute()` block. Rows are buffered in memory and written in
+batches by a background thread, so recording never adds a database round
+trip to a request. The rollups sum the rows per user, document, chain, model
+or endpoint.
+
+Cost is priced when a call is recorded, from LEXILENS_MODEL_PRICES
+("model=input/output" in USD per million tokens).
+"""
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from .database import engine
+from .models import LLMCall
+
+ENABLED = os.getenv("LEXILENS_USAGE_ENABLED", "1") == "1"
+FLUSH_SECONDS = float(os.getenv("LEXILENS_USAGE_FLUSH_SECONDS", "2"))
+BATCH_SIZE = 200
+MAX_BUFFERED = 10000  # beyond this (database down) the oldest rows are dropped
+
+DEFAULT_PRICES = {
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+GROUP_COLUMNS = {
+    "user": LLMCall.user_id,
+    "document": LLMCall.document_id,
+    "chain": LLMCall.chain,
+    "model": LLMCall.model,
+    "endpoint": LLMCall.endpoint,
+}
+
+_scope: ContextVar[Optional[dict]] = ContextVar("lexilens_usage_scope", default=None)
+
+
+def _parse_prices(raw: str) -> Dict[str, Tuple[float, float]]:
+    prices = {}
+    for item in raw.split(","):
+        model, _, rates = item.partition("=")
+        try:
+            input_rate, output_rate = (float(rate) for rate in rates.split("/"))
+        except ValueError:
+            continue
+        prices[model.strip()] = (input_rate, output_rate)
+    return prices
+
+
+PRICES = {**DEFAULT_PRICES, **_parse_prices(os.getenv("LEXILENS_MODEL_PRICES", ""))}
+
+
+def cost_usd(model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+    input_rate, output_rate = PRICES.get(model or "", (0.0, 0.0))
+    return (input_tokens * input_rate + output_tokens * output_rate) / 1_000_000
+
+
+@contextmanager
+def attribute(endpoint: str, user_id: Optional[int] = None, document_id: Optional[int] = None):
+    """Charges every call recorded inside the block (in this context) to the endpoint, user and document."""
+    token = _scope.set({"endpoint": endpoint, "user_id": user_id, "document_id": document_id})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> dict:
+    return _scope.get() or {"endpoint": None, "user_id": None, "document_id": None}
+
+
+class UsageWriter:
+    """Buffers LLMCall rows and inserts them in batches from a daemon thread."""
+
+    def __init__(self):
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lexilens-usage-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the thread and writes whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def record(self, row: dict):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._buffer.append(row)
+            overflow = len(self._buffer) - MAX_BUFFERED
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            full = len(self._buffer) >= BATCH_SIZE
+            started = self._thread is not None
+        if full:
+            self._wake.set()
+        if not started:
+            self.start()
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            with engine.begin() as conn:
+                conn.execute(LLMCall.__table__.insert(), rows)
+        except Exception as e:
+            print(f"❌ Could not write {len(rows)} LLM usage rows: {e}")
+            with self._lock:
+                # Keep them for the next flush unless that would overflow the buffer
+                room = MAX_BUFFERED - len(self._buffer)
+                self._buffer[:0] = rows[-room:] if room > 0 else []
+                self.dropped += len(rows) - max(0, room)
+            return 0
+        self.written += len(rows)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"buffered": buffered, "written": self.written, "dropped": self.dropped}
+
+
+writer = UsageWriter()
+
+
+def record_call(chain: str, model: Optional[str], tier: Optional[str], input_tokens: int, output_tokens: int,
+                latency_ms: float, status: str = "ok", scope: Optional[dict] = None):
+    writer.record({
+        **(scope or current_scope()),
+        "created_at": datetime.utcnow(),
+        "chain": chain,
+        "model": model,
+        "tier": tier,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_ms": round(latency_ms, 1),
+        "cost_usd": cost_usd(model, input_tokens, output_tokens),
+        "cached": False,
+        "status": status,
+    })
+
+
+def record_cache_hit(chain: str):
+    writer.record({
+        **current_scope(),
+        "created_at": datetime.utcnow(),
+        "chain": chain,
+        "model": None,
+        "tier": None,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "latency_ms": 0.0,
+        "cost_usd": 0.0,
+        "cached": True,
+        "status": "ok",
+    })
+
+
+def rollup(db: Session, group_by: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+           user_id: Optional[int] = None, limit: int = 100) -> List[dict]:
+    """Calls, tokens, cost and latency per `group_by` key, most expensive first."""
+    key = GROUP_COLUMNS[group_by]
+    served = LLMCall.cached.is_(False)
+    query = db.query(
+        key.label("key"),
+        func.count(LLMCall.id).label("calls"),
+        func.sum(case((LLMCall.cached.is_(True), 1), else_=0)).label("cache_hits"),
+        func.sum(case((LLMCall.status != "ok", 1), else_=0)).label("failed"),
+        func.coalesce(func.sum(LLMCall.input_tokens), 0).label("input_tokens"),
+        func.coalesce(func.sum(LLMCall.output_tokens), 0).label("output_tokens"),
+        func.coalesce(func.sum(LLMCall.cost_usd), 0.0).label("cost_usd"),
+        func.avg(case((served, LLMCall.latency_ms))).label("avg_latency_ms"),
+        func.max(case((served, LLMCall.latency_ms))).label("max_latency_ms"),
+    )
+    if start:
+        query = query.filter(LLMCall.created_at >= start)
+    if end:
+        query = query.filter(LLMCall.created_at < end)
+    if user_id is not None:
+        query = query.filter(LLMCall.user_id == user_id)
+    rows = query.group_by(key).order_by(func.sum(LLMCall.cost_usd).desc()).limit(limit).all()
+    return [
+        {
+            "key": None if row.key is None else str(row.key),
+            "calls": row.calls,
+            "cache_hits": int(row.cache_hits or 0),
+            "failed": int(row.failed or 0),
+            "input_tokens": int(row.input_tokens),
+            "output_tokens": int(row.output_tokens),
+            "cost_usd": round(float(row.cost_usd), 6),
+            "avg_latency_ms": round(float(row.avg_latency_ms), 1) if row.avg_latency_ms is not None else None,
+            "max_latency_ms": round(float(row.max_latency_ms), 1) if row.max_latency_ms is not None else None,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,66 @@
+"""Cold-start benchmark for the API.
+
+Imports backend.main in fresh interpreters with `-X importtime` and reports
+the median wall time plus the slowest modules, grouped by top-level package.
+Use --preload to measure what a worker pays when LEXILENS_PRELOAD=1 (or when
+nothing was preloaded by the gunicorn master).
+
+    python -m benchmarks.import_time --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure_once(target: str) -> Tuple[float, Dict[str, int]]:
+    """Returns (wall seconds, self-time in microseconds per top-level package)."""
+    code = f"import time; t = time.perf_counter(); {target}; print(time.perf_counter() - t)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    per_package: Dict[str, int] = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            per_package[match.group(4).split(".")[0]] += int(match.group(1))
+    wall = float(proc.stdout.strip().splitlines()[-1])
+    return wall, per_package
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure API cold-start import time.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--preload", action="store_true", help="also import the lazily loaded heavy modules")
+    args = parser.parse_args(argv)
+
+    target = "import backend.main"
+    if args.preload:
+        target += "; from backend.llm_client import preload_heavy_modules; preload_heavy_modules()"
+
+    walls, totals = [], defaultdict(list)
+    for _ in range(args.runs):
+        wall, per_package = measure_once(target)
+        walls.append(wall)
+        for package, micros in per_package.items():
+            totals[package].append(micros)
+
+    print(f"{target}\nmedian wall time over {args.runs} runs: {statistics.median(walls) * 1000:.1f} ms\n")
+    print(f"{'package':<32} {'median self ms':>15}")
+    ranked = sorted(totals.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)
+    for package, samples in ranked[:args.top]:
+        print(f"{package:<32} {statistics.median(samples) / 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
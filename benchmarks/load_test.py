@@ -0,0 +1,206 @@
+"""Offline load test for the LexiLens API.
+
+Runs load scenarios against /token, /user/documents, /document/{id}/query and
+/analyze, reports p50/p95/p99 latency and requests/sec, and stores each run
+under benchmarks/results/ so regressions can be spotted against earlier runs.
+
+Against an already running server (start it with LEXILENS_LLM_BACKEND=fake):
+
+    python -m benchmarks.load_test --base-url http://localhost:8000
+
+Or fully self-contained, with the API served in-process on a throwaway SQLite DB:
+
+    python -m benchmarks.load_test --in-process --requests 200 --concurrency 16
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from .synthetic_contracts import generate_contract_pdf
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SCENARIOS = ["token", "documents", "query", "analyze"]
+TEST_USER = {"username": "test@example.com", "password": "test123"}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(name: str, latencies_ms: List[float], errors: int, wall_seconds: float) -> dict:
+    ordered = sorted(latencies_ms)
+    return {
+        "scenario": name,
+        "requests": len(latencies_ms) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "requests_per_sec": round(len(ordered) / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+def run_scenario(name: str, call: Callable[[requests.Session], requests.Response], total: int, concurrency: int) -> dict:
+    """Fires `total` calls across `concurrency` threads, one keep-alive session per thread."""
+    local = threading.local()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = call(local.session).status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return summarize(name, latencies, errors, time.perf_counter() - wall_start)
+
+
+def login(base_url: str) -> str:
+    response = requests.post(f"{base_url}/token", data=TEST_USER)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def upload(session: requests.Session, base_url: str, headers: dict, pdf_path: str) -> requests.Response:
+    with open(pdf_path, "rb") as f:
+        return session.post(f"{base_url}/analyze", files={"file": (os.path.basename(pdf_path), f.read())}, headers=headers)
+
+
+def build_scenarios(base_url: str, pdf_path: str, question: str) -> Dict[str, Callable[[requests.Session], requests.Response]]:
+    headers = {"Authorization": f"Bearer {login(base_url)}"}
+    seeded = upload(requests.Session(), base_url, headers, pdf_path)
+    seeded.raise_for_status()
+    doc_id = seeded.json()["document_id"]
+
+    return {
+        "token": lambda s: s.post(f"{base_url}/token", data=TEST_USER),
+        "documents": lambda s: s.get(f"{base_url}/user/documents", headers=headers),
+        "query": lambda s: s.post(f"{base_url}/document/{doc_id}/query", json={"question": question}, headers=headers),
+        "analyze": lambda s: upload(s, base_url, headers, pdf_path),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_in_process_server() -> str:
+    """Serves backend.main:app with the fake LLM on a throwaway SQLite database."""
+    os.environ.setdefault("LEXILENS_LLM_BACKEND", "fake")
+    os.environ.setdefault("SUPABASE_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config("backend.main:app", host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(run: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{run['started_at'].replace(':', '').replace('-', '')}.json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    return path
+
+
+def load_previous_run(exclude: str) -> Optional[dict]:
+    paths = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if p != exclude)
+    if not paths:
+        return None
+    with open(paths[-1]) as f:
+        return json.load(f)
+
+
+def print_report(run: dict, previous: Optional[dict]):
+    before = {r["scenario"]: r for r in (previous or {}).get("results", [])}
+    print(f"\n{'scenario':<10} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}  vs previous")
+    for r in run["results"]:
+        delta = ""
+        if r["scenario"] in before:
+            old = before[r["scenario"]]
+            delta = f"p95 {r['p95_ms'] - old['p95_ms']:+.1f} ms, req/s {r['requests_per_sec'] - old['requests_per_sec']:+.1f}"
+        print(f"{r['scenario']:<10} {r['requests']:>6} {r['errors']:>5} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['requests_per_sec']:>8}  {delta}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline load test for the LexiLens API.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default=os.getenv("BACKEND_URL", "http://localhost:8000"))
+    target.add_argument("--in-process", action="store_true", help="serve the API in this process with the fake LLM")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10, help="size of the synthetic contract uploaded by /analyze")
+    parser.add_argument("--question", default="What is the notice period for termination?")
+    parser.add_argument("--no-save", action="store_true", help="do not store results for later comparison")
+    args = parser.parse_args(argv)
+
+    base_url = start_in_process_server() if args.in_process else args.base_url.rstrip("/")
+    pdf_path = generate_contract_pdf(os.path.join(tempfile.mkdtemp(), f"contract_{args.pages}p.pdf"), args.pages)
+    scenarios = build_scenarios(base_url, pdf_path, args.question)
+
+    run = {
+        "started_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_revision": _git_revision(),
+        "base_url": base_url,
+        "pages": args.pages,
+        "concurrency": args.concurrency,
+        "fake_llm": {k: v for k, v in os.environ.items() if k.startswith("LEXILENS_FAKE_LLM_")},
+        "results": [],
+    }
+    for name in args.scenarios:
+        print(f"🚀 Running '{name}' ({args.requests} requests, concurrency {args.concurrency})...")
+        run["results"].append(run_scenario(name, scenarios[name], args.requests, args.concurrency))
+
+    path = None if args.no_save else save_results(run)
+    print_report(run, load_previous_run(exclude=path))
+    if path:
+        print(f"\n💾 Results saved to {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Lookup latency of the near-duplicate index at library scale.
+
+Fills a throwaway SQLite database with N documents' MinHash signatures and LSH
+band rows, then times find_near_duplicates for uploads that are variants of
+an indexed template. Most indexed signatures are random; every
+--family-size-th one is a perturbed copy of a shared template, which mirrors a
+library full of near-identical contracts. Also reports how long signing a
+synthetic contract of --pages pages takes.
+
+    python -m benchmarks.near_duplicates --documents 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+os.environ.setdefault("SUPABASE_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/near_duplicates.db")
+
+
+def perturb(sig: List[int], rng: random.Random, changed: float) -> List[int]:
+    return [rng.getrandbits(57) if rng.random() < changed else value for value in sig]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Near-duplicate index lookup benchmark.")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--family-size", type=int, default=20, help="one in N indexed documents is a template variant")
+    parser.add_argument("--pages", type=int, default=50, help="size of the contract used to time signing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from backend.database import SessionLocal, engine
+    from backend.models import Document, DocumentBand, User, create_tables
+    from backend.near_duplicates import NUM_HASHES, band_keys, encode, find_near_duplicates, signature
+    from benchmarks.synthetic_contracts import generate_contract_text
+
+    create_tables()
+    rng = random.Random(args.seed)
+    text = "\n".join(generate_contract_text(args.pages, seed=args.seed))
+    started = time.perf_counter()
+    template = signature(text)
+    sign_ms = (time.perf_counter() - started) * 1000
+
+    db = SessionLocal()
+    owner = User(email="bench@example.com", hashed_password="-")
+    db.add(owner)
+    db.commit()
+
+    print(f"📚 Indexing {args.documents} documents...")
+    started = time.perf_counter()
+    batch = 5000
+    for offset in range(0, args.documents, batch):
+        docs, bands = [], []
+        for doc_id in range(offset + 1, min(offset + batch, args.documents) + 1):
+            if doc_id % args.family_size == 0:
+                sig = perturb(template, rng, 0.1)
+            else:
+                sig = [rng.getrandbits(57) for _ in range(NUM_HASHES)]
+            docs.append({"id": doc_id, "title": f"Doc {doc_id}", "filename": f"{doc_id}.pdf", "owner_id": owner.id, "minhash": encode(sig)})
+            bands.extend({"document_id": doc_id, "owner_id": owner.id, "bucket": key} for key in band_keys(sig))
+        with engine.begin() as conn:
+            conn.execute(Document.__table__.insert(), docs)
+            conn.execute(DocumentBand.__table__.insert(), bands)
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    timings, found = [], 0
+    for _ in range(args.queries):
+        query = perturb(template, rng, 0.1)
+        started = time.perf_counter()
+        matches = find_near_duplicates(db, owner.id, query)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += bool(matches)
+    db.close()
+
+    timings.sort()
+    print(f"✍️ Signing a {args.pages}-page contract: {sign_ms:.1f} ms")
+    print(f"🔎 Lookup over {args.documents} documents: p50 {statistics.median(timings):.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, matches found for {found}/{args.queries} queries")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Synthetic contract PDFs for offline benchmarking.
+
+Generates realistic-looking service agreements of any length (1-500 pages)
+with numbered clauses across the categories the risk prompt looks for, plus the
+repeated page headers, footers and confidentiality legends real contracts carry.
+
+    python -m benchmarks.synthetic_contracts --pages 1 10 100 500 --out benchmarks/fixtures
+"""
+import argparse
+import os
+import random
+from typing import List
+
+import fitz
+
+CLAUSE_TEMPLATES = {
+    "Termination": [
+        "Either party may terminate this Agreement upon {days} days' prior written notice to the other party.",
+        "The Company may terminate this Agreement immediately and without notice if the Contractor breaches any term herein.",
+        "Upon termination, the Contractor shall return all materials and shall not be entitled to any further compensation.",
+    ],
+    "Payment": [
+        "The Client shall pay all invoices within {days} days of receipt. Late payments shall accrue interest at {pct}% per month.",
+        "Fees are non-refundable and payable in advance on the first day of each calendar month.",
+        "The Company may withhold payment for any deliverable it determines, in its sole discretion, to be unsatisfactory.",
+    ],
+    "Liability": [
+        "In no event shall the Company's aggregate liability exceed the fees paid in the {days} days preceding the claim.",
+        "The Contractor shall indemnify and hold harmless the Company against any and all claims, losses and damages.",
+        "Neither party shall be liable for indirect, incidental, special or consequential damages.",
+    ],
+    "Intellectual Property": [
+        "All intellectual property created under this Agreement shall vest exclusively in the Company upon creation.",
+        "The Contractor hereby assigns all right, title and interest in any inventions, whether or not related to the Services.",
+        "Each party retains ownership of its pre-existing intellectual property and grants a limited licence for the term.",
+    ],
+    "Confidentiality": [
+        "The Receiving Party shall keep all Confidential Information in strict confidence for a period of {years} years.",
+        "Confidential Information excludes information that is or becomes publicly available through no fault of the recipient.",
+        "The Contractor shall not disclose the existence or terms of this Agreement to any third party.",
+    ],
+    "Dispute Resolution": [
+        "Any dispute arising out of this Agreement shall be referred to binding arbitration seated in {city}.",
+        "This Agreement shall be governed by the laws of {city}, and the courts there shall have exclusive jurisdiction.",
+        "The parties shall first attempt to resolve any dispute through good-faith negotiation for {days} days.",
+    ],
+    "General": [
+        "This Agreement constitutes the entire agreement between the parties and supersedes all prior understandings.",
+        "No amendment to this Agreement shall be effective unless made in writing and signed by both parties.",
+        "Any notice under this Agreement shall be delivered in writing to the addresses set out above.",
+        "If any provision of this Agreement is held invalid, the remaining provisions shall continue in full force.",
+    ],
+}
+
+CITIES = ["New Delhi", "Mumbai", "London", "Singapore", "New York"]
+LINES_PER_PAGE = 38
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        days=rng.choice([7, 15, 30, 45, 60, 90]),
+        pct=rng.choice([1, 1.5, 2, 5]),
+        years=rng.choice([2, 3, 5, 10]),
+        city=rng.choice(CITIES),
+    )
+
+
+def generate_contract_text(pages: int, seed: int = 0) -> List[str]:
+    """Returns one block of body text per page for a contract of `pages` pages."""
+    rng = random.Random(seed)
+    categories = list(CLAUSE_TEMPLATES)
+    page_texts = []
+    section, sub = 1, 0
+    for page_no in range(pages):
+        lines: List[str] = []
+        if page_no == 0:
+            lines += [
+                "MASTER SERVICES AGREEMENT",
+                "",
+                f"This Agreement is entered into by Acme Holdings Ltd. (the \"Company\") and Contractor #{seed} (the \"Contractor\").",
+                "",
+            ]
+        while len(lines) < LINES_PER_PAGE:
+            category = categories[(section - 1) % len(categories)]
+            if sub == 0:
+                lines.append(f"{section}. {category.upper()}")
+            sub += 1
+            lines.append(f"{section}.{sub} {_fill(rng.choice(CLAUSE_TEMPLATES[category]), rng)}")
+            if sub >= rng.randint(2, 4):
+                section, sub = section + 1, 0
+        page_texts.append("\n".join(lines))
+    return page_texts
+
+
+def generate_contract_pdf(path: str, pages: int, seed: int = 0) -> str:
+    """Writes a synthetic contract PDF with `pages` pages to `path` and returns the path."""
+    if not 1 <= pages <= 500:
+        raise ValueError("pages must be between 1 and 500")
+    doc = fitz.open()
+    for page_no, body in enumerate(generate_contract_text(pages, seed), start=1):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page.insert_text((50, 40), "ACME HOLDINGS LTD. - MASTER SERVICES AGREEMENT", fontsize=8)
+        page.insert_textbox(fitz.Rect(50, 60, PAGE_WIDTH - 50, PAGE_HEIGHT - 70), body, fontsize=9)
+        page.insert_text((50, PAGE_HEIGHT - 45), "CONFIDENTIAL - Do not distribute without written consent.", fontsize=7)
+        page.insert_text((PAGE_WIDTH - 110, PAGE_HEIGHT - 30), f"Page {page_no} of {pages}", fontsize=7)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic contract PDFs.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 200, 500])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join("benchmarks", "fixtures"))
+    args = parser.parse_args()
+    for pages in args.pages:
+        path = generate_contract_pdf(os.path.join(args.out, f"contract_{pages}p.pdf"), pages, args.seed)
+        print(f"✅ {path}")
+
+
+if __name__ == "__main__":
+    main()
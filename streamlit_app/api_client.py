@@ -0,0 +1,179 @@
+"""Shared HTTP client for talking to the LexiLens backend.
+
+All calls go through one pooled keep-alive `requests.Session`, so reruns reuse
+open TCP/TLS connections. Read-only lookups (document list, document detail,
+suggestions, negotiations) are cached with a TTL under keys scoped to the
+caller's token, and invalidated when the user uploads or deletes documents.
+Once a document detail entry expires it is revalidated with its ETag, so an
+unchanged document comes back as an empty 304 instead of the full text.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "120"))
+
+DOCUMENTS_TTL = 60
+ANALYSIS_TTL = 600
+PENDING_ANALYSIS_TTL = 3  # analysis missing or still streaming in: re-check soon
+SUGGESTIONS_TTL = 3600
+NEGOTIATIONS_TTL = 120
+MAX_CACHE_ENTRIES = 2000
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = _build_session()
+_cache = {}
+_etags = {}  # (scope, doc_id) -> (etag, last document body), kept past TTL for revalidation
+_cache_lock = threading.Lock()
+
+
+def _scope(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _cached(token: str, key: tuple, ttl_for: Callable[[Any], float], fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """Returns a fresh cached value for (token, key) or fetches and stores it; failures are not cached."""
+    cache_key = (_scope(token),) + key
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(cache_key)
+        if hit and hit[0] > now:
+            return hit[1]
+    value = fetch()
+    if value is not None:
+        with _cache_lock:
+            if len(_cache) >= MAX_CACHE_ENTRIES:
+                for stale in [k for k, (expires, _) in _cache.items() if expires <= now] or list(_cache)[:MAX_CACHE_ENTRIES // 10]:
+                    _cache.pop(stale, None)
+            _cache[cache_key] = (now + ttl_for(value), value)
+    return value
+
+
+def invalidate(token: str, doc_id: Optional[str] = None, documents_list: bool = True):
+    """Drops cached entries for this token: the document list and/or everything about one document."""
+    scope = _scope(token)
+    with _cache_lock:
+        for key in list(_cache):
+            if key[0] != scope:
+                continue
+            if (documents_list and key[1] == "documents") or (doc_id is not None and len(key) > 2 and key[2] == str(doc_id)):
+                del _cache[key]
+        if doc_id is not None:
+            _etags.pop((scope, str(doc_id)), None)
+
+
+def _get_json(token: str, path: str) -> Optional[Any]:
+    response = _session.get(f"{BACKEND_URL}{path}", headers=_headers(token), timeout=TIMEOUT)
+    return response.json() if response.status_code == 200 else None
+
+
+def _get_document_conditional(token: str, doc_id) -> Optional[dict]:
+    key = (_scope(token), str(doc_id))
+    with _cache_lock:
+        known = _etags.get(key)
+    headers = _headers(token)
+    if known:
+        headers["If-None-Match"] = known[0]
+    response = _session.get(f"{BACKEND_URL}/documents/{doc_id}", headers=headers, timeout=TIMEOUT)
+    if response.status_code == 304 and known:
+        return known[1]
+    if response.status_code != 200:
+        return None
+    body = response.json()
+    if response.headers.get("ETag"):
+        with _cache_lock:
+            if len(_etags) >= MAX_CACHE_ENTRIES:
+                _etags.clear()
+            _etags[key] = (response.headers["ETag"], body)
+    return body
+
+
+# --- Cached reads ---
+def get_documents(token: str) -> Optional[list]:
+    return _cached(token, ("documents",), lambda _: DOCUMENTS_TTL, lambda: _get_json(token, "/user/documents"))
+
+
+def get_document(token: str, doc_id) -> Optional[dict]:
+    return _cached(
+        token, ("document", str(doc_id)),
+        lambda doc: ANALYSIS_TTL if (doc.get("analysis") or {}).get("status") == "complete" else PENDING_ANALYSIS_TTL,
+        lambda: _get_document_conditional(token, doc_id),
+    )
+
+
+def get_suggestions(token: str, doc_id) -> Optional[dict]:
+    return _cached(token, ("suggestions", str(doc_id)), lambda _: SUGGESTIONS_TTL,
+                   lambda: _get_json(token, f"/documents/{doc_id}/suggestions"))
+
+
+def get_negotiations(token: str, doc_id) -> Optional[dict]:
+    return _cached(token, ("negotiations", str(doc_id)), lambda _: NEGOTIATIONS_TTL,
+                   lambda: _get_json(token, f"/documents/{doc_id}/negotiations"))
+
+
+# --- Uncached calls ---
+def login(email: str, password: str) -> requests.Response:
+    return _session.post(f"{BACKEND_URL}/token", data={"username": email, "password": password}, timeout=TIMEOUT)
+
+
+def register(email: str, password: str) -> requests.Response:
+    return _session.post(f"{BACKEND_URL}/register", data={"email": email, "password": password}, timeout=TIMEOUT)
+
+
+def upload_document(token: str, filename: str, content: bytes) -> requests.Response:
+    response = _session.post(f"{BACKEND_URL}/analyze", files={"file": (filename, content)}, headers=_headers(token), timeout=TIMEOUT)
+    invalidate(token)
+    return response
+
+
+def delete_document(token: str, doc_id) -> requests.Response:
+    response = _session.delete(f"{BACKEND_URL}/documents/{doc_id}", headers=_headers(token), timeout=TIMEOUT)
+    invalidate(token, doc_id)
+    return response
+
+
+def _deadline_headers(token: str) -> dict:
+    # The backend stops generating once we would have given up on the response anyway
+    return {**_headers(token), "X-Request-Deadline": f"{TIMEOUT:g}"}
+
+
+def ask_question(token: str, doc_id, question: str) -> requests.Response:
+    return _session.post(f"{BACKEND_URL}/document/{doc_id}/query", json={"question": question}, headers=_deadline_headers(token), timeout=TIMEOUT)
+
+
+def analyze_scenario(token: str, doc_id, scenario_text: str) -> requests.Response:
+    return _session.post(f"{BACKEND_URL}/scenario/{doc_id}", json={"scenario_text": scenario_text}, headers=_deadline_headers(token), timeout=TIMEOUT)
+
+
+def negotiate_clause(token: str, clause_text: str, risk_level: str, doc_id=None) -> requests.Response:
+    payload = {"clause_text": clause_text, "risk_level": risk_level, "document_id": int(doc_id) if doc_id else None}
+    response = _session.post(f"{BACKEND_URL}/negotiate-clause", json=payload, headers=_headers(token), timeout=TIMEOUT)
+    if doc_id is not None:
+        with _cache_lock:
+            _cache.pop((_scope(token), "negotiations", str(doc_id)), None)
+    return response
+
+
+def get_analysis_queue(token: str) -> Optional[list]:
+    # Positions change with every finished analysis, so this is never cached
+    return _get_json(token, "/user/analysis-queue")
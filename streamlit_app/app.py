@@ -1,11 +1,9 @@
 import streamlit as st
-import requests
 import time
-import os
 
 from dotenv import load_dotenv
 load_dotenv()
-BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+import api_client as api
 # --- Page Configuration ---
 st.set_page_config(
     page_title="LexiLens AI",
@@ -31,6 +29,8 @@ if "question_text" not in st.session_state:
     st.session_state.question_text = ""
 if "scenario_text" not in st.session_state:
     st.session_state.scenario_text = ""
+if "negotiations" not in st.session_state:
+    st.session_state.negotiations = {}
 
 # --- Custom CSS for modern look ---
 st.markdown("""
@@ -121,22 +121,23 @@ st.markdown("""
 
 
 # --- API Communication Functions ---
-BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# All backend calls go through api_client: one pooled keep-alive session, and
+# token-scoped TTL caching for lookups so page switches don't hit the backend.
 
 def fetch_user_documents():
     if not st.session_state.token: return
     try:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-        response = requests.get(f"{BACKEND_URL}/user/documents", headers=headers)
-        if response.status_code == 200:
+        documents = api.get_documents(st.session_state.token)
+        if documents is not None:
+            previous = st.session_state.uploaded_documents
             st.session_state.uploaded_documents = {}
-            for doc in response.json():
+            for doc in documents:
                 doc_id = str(doc['id'])
                 st.session_state.uploaded_documents[doc_id] = {
                     "title": doc.get('title', doc['filename']),
                     "filename": doc['filename'],
                     "uploaded_at": doc.get('uploaded_at', ''),
-                    "analysis": None
+                    "analysis": previous.get(doc_id, {}).get("analysis")
                 }
     except Exception as e: print(f"Error fetching documents: {e}")
 
@@ -144,19 +145,44 @@ def load_full_document_analysis(doc_id):
     if not st.session_state.token or not doc_id: return
     try:
         with st.spinner("Loading analysis..."):
-            headers = {"Authorization": f"Bearer {st.session_state.token}"}
-            response = requests.get(f"{BACKEND_URL}/documents/{doc_id}", headers=headers)
-            if response.status_code == 200:
-                full_doc_data = response.json()
+            full_doc_data = api.get_document(st.session_state.token, doc_id)
+            if full_doc_data is not None:
                 st.session_state.uploaded_documents[doc_id]['analysis'] = full_doc_data.get('analysis')
     except Exception as e: st.error(f"An error occurred: {e}")
 
+def fetch_negotiations(doc_id):
+    """Stored negotiation suggestions for a document's flagged clauses, keyed by clause index."""
+    try:
+        data = api.get_negotiations(st.session_state.token, doc_id)
+        if data:
+            return {item["clause_index"]: item["suggestions"] for item in data.get("negotiations", [])}
+    except Exception as e: print(f"Error fetching negotiations: {e}")
+    return {}
+
 # --- UI Component Functions ---
-def display_analysis_results(analysis_result, title):
+def display_analysis_results(analysis_result, title, doc_id=None):
     if not analysis_result:
-        st.warning("Analysis for this document is not available or still processing.")
+        queued = None
+        try:
+            queued = next((item for item in api.get_analysis_queue(st.session_state.token) or [] if str(item["document_id"]) == str(doc_id)), None)
+        except Exception as e: print(f"Error fetching analysis queue: {e}")
+        if queued and queued.get("state") == "queued":
+            st.info(f"Analysis queued: position {queued['position']} in line.")
+            if st.button("🔄 Refresh", key=f"refresh_queue_{doc_id}"): st.rerun()
+        else:
+            st.warning("Analysis for this document is not available or still processing.")
         return
     st.subheader(f"📊 Analysis for: {title}")
+    if analysis_result.get('status') == "running":
+        st.info(f"Analysis in progress: {len(analysis_result.get('high_risk_clauses') or [])} flagged clauses so far.")
+        if st.button("🔄 Refresh", key=f"refresh_{doc_id}"): st.rerun()
+        for clause in analysis_result.get('high_risk_clauses') or []:
+            with st.container(border=True):
+                st.markdown(f"**{clause.get('risk', 'N/A')} risk:** {clause.get('clause', 'N/A')}")
+                st.caption(clause.get('reason', ''))
+        return
+    if analysis_result.get('status') == "partial":
+        st.warning("The risk analysis did not reach every clause, so clauses not listed below may still carry risk.")
     risk_score = analysis_result.get('overall_risk_score', 0.0)
     if risk_score is None: risk_score = 0.0
     
@@ -172,24 +198,25 @@ def display_analysis_results(analysis_result, title):
     high_risk_clauses = analysis_result.get('high_risk_clauses', [])
     
     if high_risk_clauses:
+        stored_negotiations = st.session_state.negotiations.setdefault(doc_id, {})
+        if doc_id: stored_negotiations.update(fetch_negotiations(doc_id))
         for i, clause in enumerate(high_risk_clauses):
             with st.container(border=True):
                 st.markdown(f"**Clause {i+1}:** {clause.get('clause', 'N/A')}")
                 st.info(f"**Reason:** {clause.get('reason', 'N/A')}")
                 st.progress(clause.get('confidence', 0.0), text=f"Confidence: {clause.get('confidence', 0.0):.0%}")
                 
-                if st.button("✍️ Suggest Alternatives", key=f"negotiate_{i}"):
+                if i not in stored_negotiations and st.button("✍️ Suggest Alternatives", key=f"negotiate_{i}"):
                     with st.spinner("AI is drafting negotiation suggestions..."):
-                        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                        payload = {"clause_text": clause.get('clause', ''), "risk_level": clause.get('risk', 'High')}
-                        response = requests.post(f"{BACKEND_URL}/negotiate-clause", json=payload, headers=headers)
+                        response = api.negotiate_clause(st.session_state.token, clause.get('clause', ''), clause.get('risk', 'High'), doc_id)
                         if response.status_code == 200:
-                            suggestions = response.json().get("suggestions", [])
-                            st.success("Here are some fairer alternatives:")
-                            for suggestion in suggestions:
-                                st.code(suggestion, language="text")
+                            stored_negotiations[i] = response.json().get("suggestions", [])
                         else:
                             st.error(f"Could not get suggestions: {response.text}")
+                if i in stored_negotiations:
+                    st.success("Here are some fairer alternatives:")
+                    for suggestion in stored_negotiations[i]:
+                        st.code(suggestion, language="text")
     else:
         st.success("No high-risk clauses were detected.")
 
@@ -199,13 +226,9 @@ def fetch_suggestions(doc_id):
         return
     try:
         with st.spinner("Generating suggestions..."):
-            headers = {"Authorization": f"Bearer {st.session_state.token}"}
-            response = requests.get(f"{BACKEND_URL}/documents/{doc_id}/suggestions", headers=headers)
-            if response.status_code == 200:
-                st.session_state.suggestions = response.json()
+            st.session_state.suggestions = api.get_suggestions(st.session_state.token, doc_id)
+            if st.session_state.suggestions is not None:
                 st.session_state.last_suggestion_doc_id = doc_id
-            else:
-                st.session_state.suggestions = None
     except Exception as e:
         print(f"Error fetching suggestions: {e}")
         st.session_state.suggestions = None
@@ -276,8 +299,7 @@ elif st.session_state.page == "login":
             submitted_login = st.form_submit_button("Login", use_container_width=True, type="primary")
             if submitted_login:
                 # Send 'email_login' as the 'username' field, as expected by the backend
-                login_data = {"username": email_login, "password": password_login}
-                response = requests.post(f"{BACKEND_URL}/token", data=login_data)
+                response = api.login(email_login, password_login)
                 
                 if response.status_code == 200:
                     st.session_state.token = response.json()["access_token"]
@@ -296,8 +318,7 @@ elif st.session_state.page == "login":
             
             submitted_reg = st.form_submit_button("Register", use_container_width=True)
             if submitted_reg:
-                register_data = {"email": email_reg, "password": password_reg}
-                response = requests.post(f"{BACKEND_URL}/register", data=register_data)
+                response = api.register(email_reg, password_reg)
 
                 if response.status_code == 201:
                     st.success("Registered successfully! Please login.")
@@ -308,7 +329,7 @@ elif st.session_state.token:
     # Main app logic for logged-in users
     if st.session_state.page == "dashboard":
         st.title("Dashboard")
-        if not st.session_state.uploaded_documents: fetch_user_documents()
+        fetch_user_documents()
         total_docs = len(st.session_state.uploaded_documents)
         col1, col2, col3 = st.columns(3, gap="large")
         with col1: st.markdown(f'<div class="card"><div class="card-icon">📄</div><div class="dashboard-metric">{total_docs}</div><div class="card-title">Total Documents</div></div>', unsafe_allow_html=True)
@@ -337,8 +358,8 @@ elif st.session_state.token:
                         st.session_state.current_document_id = doc_id; st.rerun()
                 with col3:
                     if st.button("Remove", key=f"remove_{doc_id}", use_container_width=True):
-                        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                        requests.delete(f"{BACKEND_URL}/documents/{doc_id}", headers=headers)
+                        api.delete_document(st.session_state.token, doc_id)
+                        st.session_state.negotiations.pop(doc_id, None)
                         fetch_user_documents(); st.rerun()
             st.divider()
         st.subheader("Upload a New Document")
@@ -346,9 +367,7 @@ elif st.session_state.token:
         if uploaded_file:
             if st.button("Analyze Document", type="primary", use_container_width=True):
                 with st.spinner("Uploading and starting analysis..."):
-                    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                    files = {"file": (uploaded_file.name, uploaded_file.getvalue())}
-                    response = requests.post(f"{BACKEND_URL}/analyze", files=files, headers=headers)
+                    response = api.upload_document(st.session_state.token, uploaded_file.name, uploaded_file.getvalue())
                     if response.status_code == 200:
                         st.success(response.json().get("message", "Analysis started!"))
                         time.sleep(1); fetch_user_documents(); st.rerun()
@@ -359,8 +378,8 @@ elif st.session_state.token:
             doc_id = st.session_state.current_document_id
             if doc_id in st.session_state.uploaded_documents:
                 doc_data = st.session_state.uploaded_documents[doc_id]
-                if doc_data.get('analysis') is None: load_full_document_analysis(doc_id)
-                display_analysis_results(doc_data.get('analysis'), doc_data['title'])
+                if doc_data.get('analysis') is None or doc_data['analysis'].get('status') == "running": load_full_document_analysis(doc_id)
+                display_analysis_results(doc_data.get('analysis'), doc_data['title'], doc_id)
 
     elif st.session_state.page == "search":
         st.title("🔎 Document Q&A")
@@ -390,14 +409,14 @@ elif st.session_state.token:
             if st.button("Ask Question", type="primary", use_container_width=True):
                 if selected_doc_id and question:
                     with st.spinner("Searching for the answer..."):
-                        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                        payload = {"question": question}
-                        response = requests.post(f"{BACKEND_URL}/document/{selected_doc_id}/query", json=payload, headers=headers)
+                        response = api.ask_question(st.session_state.token, selected_doc_id, question)
                         if response.status_code == 200:
                             result = response.json()
                             st.markdown('<div class="answer-box">', unsafe_allow_html=True)
                             st.write(result.get("answer", "No answer found."))
                             st.markdown('</div>', unsafe_allow_html=True)
+                            if result.get("status") == "partial":
+                                st.warning("The answer was cut off because it took too long. Try a narrower question.")
                         else:
                             st.error(f"Q&A failed: {response.text}")
 
@@ -430,14 +449,14 @@ elif st.session_state.token:
             if st.button("Analyze Scenario", type="primary", use_container_width=True):
                 if selected_doc_id and scenario_question:
                     with st.spinner("AI is analyzing your scenario..."):
-                        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                        payload = {"scenario_text": scenario_question}
-                        response = requests.post(f"{BACKEND_URL}/scenario/{selected_doc_id}", json=payload, headers=headers)
+                        response = api.analyze_scenario(st.session_state.token, selected_doc_id, scenario_question)
                         if response.status_code == 200:
                             result = response.json()
                             st.markdown('<div class="answer-box">', unsafe_allow_html=True)
                             st.write(result.get("analysis", "Could not analyze scenario."))
                             st.markdown('</div>', unsafe_allow_html=True)
+                            if result.get("status") == "partial":
+                                st.warning("The analysis was cut off because it took too long. Try a narrower scenario.")
                         else:
                             st.error(f"Scenario analysis failed: {response.text}")
 else:
@@ -0,0 +1,59 @@
+from backend.analysis_queue import BULK, INTERACTIVE, QUANTUM_TOKENS, AnalysisQueue, Job, _Schedule
+
+
+def _job(document_id: int, owner_id: int, cost: int = QUANTUM_TOKENS, lane: str = BULK) -> Job:
+    return Job(document_id, owner_id, cost, lane, 0.0)
+
+
+def _schedule(*jobs: Job) -> _Schedule:
+    schedule = _Schedule()
+    for job in jobs:
+        schedule.push(job)
+    return schedule
+
+
+def test_interactive_lane_goes_first():
+    schedule = _schedule(_job(1, 1), _job(2, 1), _job(3, 2, lane=INTERACTIVE))
+    assert schedule.pick(lambda job: True).document_id == 3
+    assert schedule.pick(lambda job: True).document_id == 1
+
+
+def test_owners_get_equal_token_shares_whatever_their_document_sizes():
+    small = [_job(10 + index, 1, QUANTUM_TOKENS) for index in range(4)]
+    large = [_job(20 + index, 2, 2 * QUANTUM_TOKENS) for index in range(2)]
+    served = {1: 0, 2: 0}
+    for job in _schedule(*small, *large).order():
+        served[job.owner_id] += job.cost
+        # Neither owner gets ahead by more than one of the other's jobs
+        assert abs(served[1] - served[2]) <= 2 * QUANTUM_TOKENS
+    assert served == {1: 4 * QUANTUM_TOKENS, 2: 4 * QUANTUM_TOKENS}
+
+
+def test_owner_that_runs_dry_does_not_bank_credit():
+    schedule = _schedule(_job(1, 1, 1), _job(2, 2))
+    assert [job.document_id for job in schedule.order()] == [1, 2]
+    schedule.pick(lambda job: True)
+    assert 1 not in schedule.deficit
+
+
+def test_blocked_owner_is_skipped_and_keeps_its_jobs():
+    schedule = _schedule(_job(1, 1), _job(2, 2))
+    assert schedule.pick(lambda job: job.owner_id != 1).document_id == 2
+    assert schedule.pick(lambda job: job.owner_id != 1) is None
+    assert [job.document_id for job in schedule.jobs()] == [1]
+
+
+def test_blocked_interactive_job_does_not_hold_up_others():
+    schedule = _schedule(_job(1, 1, lane=INTERACTIVE), _job(2, 2, lane=INTERACTIVE), _job(3, 3))
+    assert schedule.pick(lambda job: job.owner_id != 1).document_id == 2
+    assert schedule.pick(lambda job: job.owner_id != 1).document_id == 3
+
+
+def test_caps_per_owner_and_reserved_interactive_workers(monkeypatch):
+    monkeypatch.setattr("backend.analysis_queue.PER_USER_CONCURRENCY", 2)
+    monkeypatch.setattr("backend.analysis_queue.RESERVED_INTERACTIVE", 1)
+    queue = AnalysisQueue(lambda document_id: None, workers=3)
+    queue._running = {1: _job(1, 1), 2: _job(2, 1)}
+    assert not queue._can_run(_job(3, 1, lane=INTERACTIVE))  # owner 1 is at its cap
+    assert not queue._can_run(_job(4, 2))  # the last worker is kept for interactive uploads
+    assert queue._can_run(_job(5, 2, lane=INTERACTIVE))
@@ -0,0 +1,36 @@
+import json
+
+from backend.clauses import segment_clauses
+from backend.compare import compare_documents, stored_assessment
+from backend.models import ANALYSIS_COMPLETE, ANALYSIS_PARTIAL, Analysis
+
+CONTRACT = (
+    "1. TERMINATION\n"
+    "1.1 The Company may terminate this Agreement at will.\n"
+    "1.2 Fees are payable monthly in advance.\n"
+    "1.3 The Contractor shall indemnify the Company against all claims.\n"
+)
+
+
+def _analysis(status: str, prompt_version: str = "risk:2,simplify:1") -> Analysis:
+    flagged = [{"clause_id": "C2", "clause": "The Company may terminate this Agreement at will.", "risk": "High"}]
+    return Analysis(status=status, prompt_version=prompt_version, high_risk_clauses=json.dumps(flagged))
+
+
+def test_unsent_clauses_are_not_labelled_as_llm_assessed():
+    result = compare_documents(None, CONTRACT, None, CONTRACT, None, include_unchanged=True)
+    assert result["clauses_sent_to_llm"] == 0
+    assert [item["risk_source"] for item in result["clauses"]] == [None, None, None]
+
+
+def test_complete_analysis_covers_every_candidate():
+    clauses = segment_clauses(CONTRACT)
+    assessed, flagged = stored_assessment(_analysis(ANALYSIS_COMPLETE), clauses, "2")
+    assert len(assessed) == 3
+    assert len(flagged) == 1
+
+
+def test_partial_or_outdated_analyses_are_ignored():
+    clauses = segment_clauses(CONTRACT)
+    assert stored_assessment(_analysis(ANALYSIS_PARTIAL), clauses, "2") == (set(), {})
+    assert stored_assessment(_analysis(ANALYSIS_COMPLETE, "risk:1,simplify:1"), clauses, "2") == (set(), {})
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from backend.json_stream import ArrayItemStream, JSONRecoveryError, parse_json
+
+RESPONSE = json.dumps({
+    "overall_risk_score": 0.7,
+    "clauses": [
+        {"clause_id": "c1", "clause": "Fees {see Schedule 1} are payable monthly.", "risk": "Low"},
+        {"clause_id": "c2", "clause": 'The "Supplier" may terminate } at will ]', "risk": "High"},
+    ],
+})
+
+
+def _feed(text: str, chunk_size: int, key: str = "clauses") -> tuple:
+    stream = ArrayItemStream(key)
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(stream.feed(text[start:start + chunk_size]))
+    return stream, items
+
+
+def test_parse_json_strips_fences_and_surrounding_prose():
+    text = f"Here is the analysis:\n```json\n{RESPONSE}\n```\nLet me know if you need more."
+    assert parse_json(text) == json.loads(RESPONSE)
+
+
+def test_parse_json_drops_trailing_commas():
+    assert parse_json('{"clauses": [{"risk": "High",},],}') == {"clauses": [{"risk": "High"}]}
+
+
+def test_parse_json_recovers_the_longest_well_formed_prefix_of_a_truncated_response():
+    cut = RESPONSE.index('{"clause_id": "c2"') + 30
+    assert parse_json(RESPONSE[:cut]) == {
+        "overall_risk_score": 0.7,
+        "clauses": [json.loads(RESPONSE)["clauses"][0], {"clause_id": "c2"}],
+    }
+
+
+def test_parse_json_ignores_brackets_and_escaped_quotes_inside_strings():
+    text = '{"clause": "a \\"quoted\\" } brace [", "risk": "Low"'
+    assert parse_json(text) == {"clause": 'a "quoted" } brace ['}
+
+
+def test_parse_json_without_json_raises():
+    with pytest.raises(JSONRecoveryError):
+        parse_json("I cannot help with that.")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(RESPONSE)])
+def test_stream_yields_each_item_whatever_the_chunking(chunk_size):
+    stream, items = _feed(f"```json\n{RESPONSE}\n```", chunk_size)
+    assert items == json.loads(RESPONSE)["clauses"]
+    assert stream.complete
+    assert stream.malformed == 0
+    assert stream.result()["overall_risk_score"] == 0.7
+
+
+def test_truncated_stream_yields_only_finished_items():
+    cut = RESPONSE.index('{"clause_id": "c2"') + 30
+    stream, items = _feed(RESPONSE[:cut], 5)
+    assert [item["clause_id"] for item in items] == ["c1"]
+    assert not stream.complete
+    assert stream.result()["overall_risk_score"] == 0.7
+
+
+def test_stream_only_reads_the_requested_array():
+    text = json.dumps({"notes": [{"clause_id": "x"}], "clauses": [{"clause_id": "c1"}]})
+    _, items = _feed(text, 3)
+    assert items == [{"clause_id": "c1"}]
+
+
+def test_malformed_item_is_counted_and_skipped():
+    stream, items = _feed('{"clauses": [{"clause_id": c1}, {"clause_id": "c2"}]}', 4)
+    assert items == [{"clause_id": "c2"}]
+    assert stream.malformed == 1
@@ -0,0 +1,116 @@
+from typing import Optional
+
+import pytest
+
+from backend.model_router import ModelRouter, RoutedChain, track_models
+
+SHORT = {"text": "x" * 40}  # 10 tokens
+MEDIUM = {"text": "x" * 400}  # 100 tokens
+LONG = {"text": "x" * 4000}  # 1000 tokens
+
+
+class _Model:
+    """Stands in for a tier's compiled chain; fails on every call when `error` is set."""
+
+    def __init__(self, model_name: str, error: Optional[Exception] = None, chunks=("a", "b"),
+                 fail_after: Optional[int] = None):
+        self.model_name = model_name
+        self.error = error
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def invoke(self, inputs, config=None, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"{self.model_name}: ok"
+
+    def stream(self, inputs, config=None, **kwargs):
+        self.calls += 1
+        for index, chunk in enumerate(self.chunks):
+            if self.error and index == (self.fail_after or 0):
+                raise self.error
+            yield chunk
+        if self.error and self.fail_after is None:
+            raise self.error
+
+
+@pytest.fixture(autouse=True)
+def _small_thresholds(monkeypatch):
+    monkeypatch.setattr("backend.model_router.FAST_MAX_TOKENS", 20)
+    monkeypatch.setattr("backend.model_router.LARGE_MIN_TOKENS", 500)
+
+
+def _models(**overrides) -> dict:
+    models = {tier: _Model(f"{tier}-model") for tier in ("fast", "standard", "large")}
+    models.update(overrides)
+    return models
+
+
+def _routed(task: str, models: dict, routes: dict = None) -> RoutedChain:
+    return RoutedChain(ModelRouter(models, routes={} if routes is None else routes), task, models)
+
+
+@pytest.mark.parametrize("task, inputs, tier", [
+    ("risk", SHORT, "fast"),
+    ("risk", MEDIUM, "standard"),
+    ("risk", LONG, "large"),
+    ("suggestions", LONG, "fast"),
+    ("negotiate", SHORT, "standard"),
+    ("negotiate", LONG, "standard"),
+])
+def test_only_document_tasks_move_between_tiers_by_size(task, inputs, tier):
+    assert ModelRouter(_models(), routes={}).plan(task, inputs)[0] == tier
+
+
+@pytest.mark.parametrize("inputs", [SHORT, MEDIUM, LONG])
+def test_configured_route_wins_over_input_size(inputs):
+    assert ModelRouter(_models(), routes={"qa": "large"}).plan("qa", inputs)[0] == "large"
+
+
+def test_plan_falls_back_to_bigger_then_smaller_tiers_that_exist():
+    assert ModelRouter(_models(), routes={}).plan("negotiate", MEDIUM) == ["standard", "large", "fast"]
+    models = _models()
+    del models["large"]
+    router = ModelRouter(models, routes={"qa": "large"})
+    assert router.plan("qa", MEDIUM) == ["standard", "fast"]  # a route to a missing tier uses standard
+    assert router.plan("risk", LONG) == ["standard", "fast"]
+
+
+def test_invoke_falls_back_and_records_the_serving_model():
+    models = _models(standard=_Model("standard-model", error=TimeoutError("slow")))
+    chain = _routed("negotiate", models)
+    with track_models() as used:
+        assert chain.invoke(MEDIUM) == "large-model: ok"
+    assert used == {"negotiate": "large-model"}
+    calls = {call["tier"]: call for call in chain.router.stats()["calls"]}
+    assert calls["standard"]["failed"] == 1
+    assert calls["large"]["fallback_served"] == 1
+
+
+def test_invoke_raises_the_last_error_when_every_tier_fails():
+    models = {tier: _Model(tier, error=ConnectionError(tier)) for tier in ("fast", "standard", "large")}
+    with pytest.raises(ConnectionError, match="fast"):
+        _routed("negotiate", models).invoke(MEDIUM)
+
+
+def test_missing_prompt_variable_does_not_fall_back():
+    models = _models(standard=_Model("standard-model", error=KeyError("clauses")))
+    with pytest.raises(KeyError):
+        _routed("negotiate", models).invoke(MEDIUM)
+    assert models["large"].calls == 0
+
+
+def test_stream_falls_back_only_before_the_first_chunk():
+    models = _models(standard=_Model("standard-model", error=ConnectionError("refused")))
+    assert list(_routed("negotiate", models).stream(MEDIUM)) == ["a", "b"]
+    assert models["large"].calls == 1
+
+    models = _models(standard=_Model("standard-model", error=ConnectionError("reset"), fail_after=1))
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in _routed("negotiate", models).stream(MEDIUM):
+            received.append(chunk)
+    assert received == ["a"]
+    assert models["large"].calls == 0
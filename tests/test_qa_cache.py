@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from backend.qa_cache import SemanticAnswerCache, document_key
+
+KEY = document_key(1, 7, datetime(2024, 1, 1), 3)
+
+
+def _cache_with(question: str) -> SemanticAnswerCache:
+    cache = SemanticAnswerCache(threshold=0.8)
+    cache.store(KEY, question, "cached answer", "qa:1")
+    return cache
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Is the company liable for data loss?", "Is the company not liable for data loss?"),
+    ("Can the client terminate early?", "Can the client not terminate early?"),
+    ("What if payment is late by 30 days?", "What if payment is late by 90 days?"),
+])
+def test_questions_with_different_negations_or_numbers_miss(stored, asked):
+    assert _cache_with(stored).lookup(KEY, asked, "qa:1") is None
+
+
+def test_paraphrase_hits():
+    hit = _cache_with("notice period for termination?").lookup(KEY, "how much notice to terminate?", "qa:1")
+    assert hit is not None
+    assert hit[0].answer == "cached answer"
+
+
+def test_negation_spelling_does_not_matter():
+    cache = _cache_with("Can the client not terminate early?")
+    assert cache.lookup(KEY, "The client cannot terminate early?", "qa:1") is not None
+
+
+def test_key_covers_owner_upload_and_analysis():
+    cache = _cache_with("notice period for termination?")
+    for other in (
+        document_key(2, 7, datetime(2024, 1, 1), 3),
+        document_key(1, 7, datetime(2024, 2, 1), 3),
+        document_key(1, 7, datetime(2024, 1, 1), 4),
+    ):
+        assert cache.lookup(other, "notice period for termination?", "qa:1") is None
+
+
+def test_invalidate_drops_every_key_of_the_document():
+    cache = _cache_with("notice period for termination?")
+    cache.store(document_key(1, 7, datetime(2024, 1, 1), 4), "notice period?", "newer answer", "qa:1")
+    cache.invalidate(7)
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,51 @@
+from backend.text_cleaning import normalize_pages
+
+
+def test_short_input_keeps_bare_numbers():
+    result = normalize_pages(["Intro\n(1)\nThe party shall\n30\n", "x"])
+    lines = result.text.splitlines()
+    assert "(1)" in lines
+    assert "30" in lines
+    assert result.removed_lines == 0
+
+
+def test_numbers_inside_a_page_are_kept():
+    pages = [f"Page heading {i}\n(1)\nThe party shall pay within\n30\ndays.\n{i + 1}\n" for i in range(4)]
+    lines = normalize_pages(pages).text.splitlines()
+    assert lines.count("(1)") == 4
+    assert lines.count("30") == 4
+
+
+def test_page_numbers_at_page_edges_are_stripped():
+    bodies = ["The tenant pays rent.", "The landlord repairs.", "Either party may end it.", "Notices go by post."]
+    pages = [f"{i + 1}\n{body}\nPage {i + 1} of 4\n" for i, body in enumerate(bodies)]
+    result = normalize_pages(pages)
+    assert result.text.split("\n\n") == bodies
+    assert result.removed_lines == 8
+
+
+def _contract_page(i: int, body: str) -> str:
+    return f"ACME Services Agreement v{i}\nConfidential - do not distribute\n{body}\nPage {i + 1} of 6\n"
+
+
+def test_short_repeated_line_mid_page_is_kept():
+    pages = [
+        _contract_page(i, f"Clause {i} sets out duty number {i} of the supplier\nunder the terms of this\nAgreement.\n"
+                          f"The customer pays within {10 * (i + 1)} days.\nLate fees accrue monthly.")
+        for i in range(6)
+    ]
+    lines = normalize_pages(pages).text.splitlines()
+    assert lines.count("Agreement.") == 6
+    assert "ACME Services Agreement v0" not in lines
+    assert "Confidential - do not distribute" not in lines
+    assert not any(line.startswith("Page ") for line in lines)
+
+
+def test_body_lines_near_an_edge_that_differ_by_numbers_are_kept():
+    # The payment line falls in the bottom edge window, at a different distance from the footer page to page
+    pages = [
+        _contract_page(i, "\n".join([f"Clause {i} opens here.", f"Payment is due in {i + 1} days."] + [f"Filler {n}." for n in range(i % 3)]))
+        for i in range(6)
+    ]
+    lines = normalize_pages(pages).text.splitlines()
+    assert sum(line.startswith("Payment is due in") for line in lines) == 6